@@ -0,0 +1,72 @@
+"""
+Lockstep check of BatchMarjaPussi against MarjaPussi.
+
+    python benchmarks/check_batch.py [--games 2000] [--seed 1]
+
+Deals the same cards to both engines, plays random legal actions and
+compares legal actions, phase, player at turn, points, game value and the
+playing player after every step, with the default rules and with other
+start and max game values. Exits with 1 on the first difference. Needs numpy.
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from marjapussi.actions import PHASES  # noqa: E402
+from marjapussi.batch import DONE, BatchMarjaPussi  # noqa: E402
+from marjapussi.game import MarjaPussi  # noqa: E402
+
+NAMES = ["P1", "P2", "P3", "P4"]
+RULES = [{}, {"start_game_value": 100, "max_game_value": 200}]
+
+
+def check(n, seed, override_rules={}) -> int:
+    """Plays n games in both engines, returns the number of steps or exits on a difference."""
+    rng = random.Random(seed)
+    games = [MarjaPussi(NAMES, override_rules=override_rules, log=False, seed=seed + i) for i in range(n)]
+    batch = BatchMarjaPussi(n, override_rules=override_rules)
+    batch.reset(hands=[[p.hand for p in game.players] for game in games])
+    steps = 0
+    while not (batch.phase == DONE).all():
+        legal = batch.legal_mask()
+        ids = np.zeros(n, dtype=np.int64)
+        for i, game in enumerate(games):
+            expected = game.legal_action_ids()
+            state = (PHASES[batch.phase[i]], int(batch.turn[i]), batch.points[i].tolist(),
+                     int(batch.game_value[i]), int(batch.playing[i]))
+            scalar = (game.phase, game.player_at_turn.number, [p.points_made for p in game.players],
+                      game.game_value, -1 if game.playing_player is None else game.playing_player.number)
+            if game.phase == "DONE":
+                # the batch keeps the turn of the last trick
+                state, scalar = state[:1] + state[2:], scalar[:1] + scalar[2:]
+            if np.nonzero(legal[i])[0].tolist() != expected or state != scalar:
+                sys.exit(f"game {i} (seed {seed + i}, rules {override_rules}) differs after "
+                         f"{game.all_actions}:\n  batch  {state} {np.nonzero(legal[i])[0].tolist()}\n"
+                         f"  scalar {scalar} {expected}")
+            if expected:
+                ids[i] = rng.choice(expected)
+                game.act_action_id(int(ids[i]))
+        batch.step(ids)
+        steps += 1
+    if any(game.phase != "DONE" for game in games):
+        sys.exit(f"batch finished before the scalar games (rules {override_rules})")
+    return steps
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000, help="games per ruleset")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    for rules in RULES:
+        steps = check(args.games, args.seed, rules)
+        print(f"ok: {args.games} games, {steps} steps, rules {rules}")
+
+
+if __name__ == "__main__":
+    main()
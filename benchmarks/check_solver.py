@@ -0,0 +1,73 @@
+"""
+Cross-check of the double dummy solver against exhaustive search.
+
+    python benchmarks/check_solver.py [--positions 300] [--tricks 2] [--seed 1]
+
+Plays random games up to one of the last tricks, then compares Solver.solve
+with a plain minimax over all legal actions of the engine (questions and
+answers included) for every legal action. Exits with 1 on the first
+difference.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from marjapussi.game import MarjaPussi  # noqa: E402
+from marjapussi.solver import Solver  # noqa: E402
+
+NAMES = ["P1", "P2", "P3", "P4"]
+
+
+def exhaustive(game, team) -> int:
+    """Final points of team with perfect play, by trying every action."""
+    if game.phase == "DONE":
+        return sum(p.points_made for p in game.players if p.number % 2 == team)
+    values = []
+    for action_id in game.legal_action_ids():
+        child = game.clone()
+        child.act_action_id(action_id)
+        values.append(exhaustive(child, team))
+    return max(values) if game.player_at_turn.number % 2 == team else min(values)
+
+
+def position(seed, tricks_left):
+    """Random game at some point of the trick phase with tricks_left tricks to go, or DONE."""
+    rng = random.Random(seed)
+    game = MarjaPussi(NAMES, log=False, seed=seed)
+    while game.phase != "DONE":
+        if game.phase in ("QUES", "ANSW", "TRCK") and len(game.plays) >= 4 * (9 - tricks_left) \
+                and rng.random() < 0.3:
+            break
+        game.act_action(rng.choice(game.legal_actions()))
+    return game
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--positions", type=int, default=300)
+    parser.add_argument("--tricks", type=int, default=2, help="tricks left at most, 3 takes minutes")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    checked = 0
+    for seed in range(args.seed, args.seed + args.positions):
+        game = position(seed, args.tricks)
+        if game.phase == "DONE":
+            continue
+        team = game.player_at_turn.number % 2
+        solved = Solver(game).solve()
+        for action in game.legal_actions():
+            child = game.clone()
+            child.act_action(action)
+            expected = exhaustive(child, team)
+            if solved[action] != expected:
+                sys.exit(f"seed {seed} after {game.all_actions}: {action} solved {solved[action]}, "
+                         f"exhaustive {expected}")
+        checked += 1
+    print(f"ok: {checked} positions with at most {args.tricks} tricks left")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmarks of the engine with fixed seeds.
+
+    python benchmarks/run.py [--out results.json] [--compare old.json] [--quick] [--check-budget]
+
+Prints the results as JSON (times in microseconds, memory in bytes) and
+optionally the ratio to an older result file, > 1 means slower or bigger.
+--check-budget exits with 1 if a game needs more memory than MEMORY_BUDGET or
+starting up takes longer than STARTUP_BUDGET.
+"""
+import argparse
+import compileall
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+from statistics import median
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import marjapussi.exchange as exchange  # noqa: E402
+from marjapussi.actions import ACTING_PHASES  # noqa: E402
+import marjapussi.utils as utils  # noqa: E402
+from marjapussi.game import MarjaPussi  # noqa: E402
+from marjapussi.player import Player  # noqa: E402
+
+SEED = 1
+NAMES = ["P1", "P2", "P3", "P4"]
+# bytes per live game, measured about 1550 and 2150 with CPython 3.11 on 64 bit
+MEMORY_BUDGET = {"bytes_per_new_game": 2000, "bytes_per_game_in_tricks": 2600}
+# milliseconds in a fresh interpreter, measured about 5 and 0.7, importing logging is a side effect
+STARTUP_BUDGET = {"import_game_ms": 20, "first_game_ms": 4, "imports_logging": 0}
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+from marjapussi.game import MarjaPussi
+imported = time.perf_counter()
+MarjaPussi(["P1", "P2", "P3", "P4"], log=False)
+done = time.perf_counter()
+print(json.dumps({"import_game_ms": (imported - start) * 1e3, "first_game_ms": (done - imported) * 1e3,
+                  "imports_logging": int("logging" in sys.modules)}))
+"""
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def random_game(seed, stop=None) -> MarjaPussi:
+    """Game with random actions, after stop actions or finished."""
+    rng = random.Random(seed)
+    game = MarjaPussi(NAMES, log=False, seed=seed)
+    while game.phase != "DONE" and (stop is None or len(game.all_actions) < stop):
+        game.act_action(rng.choice(game.legal_actions()))
+    return game
+
+
+def positions(n) -> list:
+    """n games stopped at random points, same for every run."""
+    rng = random.Random(SEED)
+    return [random_game(seed, stop=rng.randrange(1, 60)) for seed in range(n)]
+
+
+def per_call(stmt, number) -> float:
+    """Best of 5 of the time of one call in microseconds."""
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def micro(quick) -> dict:
+    n = 200 if quick else 1000
+    games = [g for g in positions(n) if g.phase != "DONE"]
+    trick_games = [g for g in games if g.phase == "TRCK"]
+    results = {}
+
+    def legal_uncached():
+        for g in games:
+            g._legal = g._legal_actions = None
+            g.legal_actions()
+    results["legal_actions"] = per_call(legal_uncached, 5) / len(games)
+    results["legal_actions_cached"] = per_call(lambda: [g.legal_actions() for g in games], 5) / len(games)
+    results["state_dict"] = per_call(lambda: [g.state_dict() for g in games], 5) / len(games)
+
+    results["clone"] = per_call(lambda: [g.clone() for g in games], 5) / len(games)
+
+    tricks = [(g.tricks[-1], g.player_at_turn.cards, g.sup_col, len(g.tricks) == 1) for g in trick_games]
+    results["allowed_general"] = per_call(
+        lambda: [utils.allowed_general(t, c, sup_col=s, first=f) for t, c, s, f in tricks], 20) / len(tricks)
+    full = [(trick, g.sup_col) for g in games for trick in g.tricks[:-1]]
+    results["high_card"] = per_call(lambda: [utils.high_card(t, sup_col=s) for t, s in full], 20) / len(full)
+
+    exchanges = [g for g in games if g.phase in ("PASS", "PBCK")]
+
+    def exchange_uncached():
+        exchange._rank.cache_clear()
+        for g in exchanges:
+            exchange.best_exchange(g)
+    results["best_exchange"] = per_call(exchange_uncached, 1) / len(exchanges)
+
+    player = Player("P", 0, MarjaPussi.DEFAULT_RULES["points"])
+    cards = utils.CARDS
+
+    def give_take():
+        for c in cards:
+            player.give_card(c)
+        for c in cards:
+            player.take_card(c)
+    results["give_card_take_card"] = per_call(give_take, 200) / (2 * len(cards))
+    return results
+
+
+def games_per_second(quick) -> dict:
+    n = 100 if quick else 1000
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for seed in range(n):
+            random_game(seed)
+        best = min(best, time.perf_counter() - start)
+    return {"random_games_per_s": n / best}
+
+
+def phase_latency(quick) -> dict:
+    """Median and 99th percentile of act_action by phase of the action."""
+    n = 200 if quick else 2000
+    times = {phase: [] for phase in ACTING_PHASES}
+    clock = time.perf_counter_ns
+    for seed in range(n):
+        rng = random.Random(seed)
+        game = MarjaPussi(NAMES, log=False, seed=seed)
+        while game.phase != "DONE":
+            action = rng.choice(game.legal_actions())
+            start = clock()
+            game.act_action(action)
+            times[action.split(",")[1]].append(clock() - start)
+    results = {"act_action_median": median(t for ts in times.values() for t in ts) / 1e3}
+    for phase, ts in times.items():
+        if ts:
+            ts.sort()
+            results[f"{phase}_median"] = median(ts) / 1e3
+            results[f"{phase}_p99"] = ts[int(len(ts) * 0.99)] / 1e3
+    return results
+
+
+def memory(quick) -> dict:
+    """Bytes allocated per game alive, new and in the middle of the trick phase."""
+    n = 200 if quick else 1000
+    results = {}
+    for name, stop in (("new_game", 0), ("game_in_tricks", 30)):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        games = [random_game(seed, stop=stop) for seed in range(n)]
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[f"bytes_per_{name}"] = (after - before) / len(games)
+        del games
+    return results
+
+
+def startup(quick) -> dict:
+    """Import of marjapussi.game and the first game in a fresh interpreter, best of several runs."""
+    # measure imports from bytecode, not compiling
+    compileall.compile_dir(os.path.join(ROOT, "marjapussi"), quiet=1)
+    best = {}
+    for _ in range(3 if quick else 10):
+        run = subprocess.run([sys.executable, "-c", STARTUP], capture_output=True, text=True, cwd=ROOT, check=True)
+        for key, value in json.loads(run.stdout).items():
+            best[key] = min(best.get(key, value), value)
+    return best
+
+
+def meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit or None,
+            "seed": SEED}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", help="write results to this file")
+    parser.add_argument("--compare", help="result file of an earlier run")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    parser.add_argument("--check-budget", action="store_true", help="fail if over MEMORY_BUDGET or STARTUP_BUDGET")
+    args = parser.parse_args()
+
+    results = {}
+    for bench in (micro, games_per_second, phase_latency, memory, startup):
+        results.update({key: round(value, 3) for key, value in bench(args.quick).items()})
+    report = {"meta": meta(), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)["results"]
+        print(f"\nratio to {args.compare} (> 1 is slower or bigger):")
+        for key, value in results.items():
+            if old.get(key):
+                ratio = value / old[key]
+                # more games per second is better
+                ratio = 1 / ratio if key.endswith("_per_s") else ratio
+                print(f"  {key:28} {ratio:6.2f}")
+    if args.check_budget:
+        budget = MEMORY_BUDGET | STARTUP_BUDGET
+        over = {key: results[key] for key, limit in budget.items() if results[key] > limit}
+        if over:
+            sys.exit(f"over budget {budget}: {over}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Integer encoding of actions.
+
+An action id only encodes the content of an action, player and phase follow
+from the state of the game. Ids are ordered like the action strings returned
+by MarjaPussi.legal_actions:
+    0..13   questions and answers (QUES, ANSW)
+    14..49  cards (PASS, PBCK, TRCK)
+    50..    game values (PROV, PRMO), 50 is "0", 50 + k is start_game_value + 5*k
+"""
+from marjapussi.cardmask import COLORS, CARDS
+
+# all phases in order, the index of a phase is its number in batch, observation and zobrist
+PHASES = ["PROV", "PASS", "PBCK", "PRMO", "QUES", "ANSW", "TRCK", "DONE"]
+ACTING_PHASES = PHASES[:-1]  # DONE has no actions
+CALLS = [f"my{col}" for col in COLORS] + ["you"] + [f"ou{col}" for col in COLORS] + \
+    ["nmy"] + [f"no{col}" for col in COLORS]
+CALL_ID = {call: i for i, call in enumerate(CALLS)}
+PAIR_CALL = {col: CALL_ID[f"my{col}"] for col in COLORS}
+HALF_CALL = {col: CALL_ID[f"ou{col}"] for col in COLORS}
+NO_HALF_CALL = {col: CALL_ID[f"no{col}"] for col in COLORS}
+CARD_BASE = len(CALLS)
+VALUE_BASE = CARD_BASE + len(CARDS)
+
+CARD_ACTIONS = ((1 << len(CARDS)) - 1) << CARD_BASE
+HALF_ACTIONS = sum(1 << i for i in HALF_CALL.values())
+QUES_ACTIONS = sum(1 << CALL_ID[call] for call in CALLS if call[:2] in ("my", "yo", "ou"))
+ANSW_ACTIONS = sum(1 << CALL_ID[call] for call in CALLS if call != "you")
+
+
+class ActionSpace():
+    """All actions of games with the same start and max game value."""
+
+    def __init__(self, start_game_value: int, max_game_value: int) -> None:
+        self.start_game_value = start_game_value
+        self.max_game_value = max_game_value
+        self.values = [0] + list(range(start_game_value+5, max_game_value+1, 5))
+        self.num_actions = VALUE_BASE + len(self.values)
+        self.contents = CALLS + CARDS + [str(val) for val in self.values]
+        value_actions = ((1 << len(self.values)) - 1) << VALUE_BASE
+        in_phase = {"PROV": value_actions, "PASS": CARD_ACTIONS, "PBCK": CARD_ACTIONS,
+                    "PRMO": value_actions, "QUES": QUES_ACTIONS, "ANSW": ANSW_ACTIONS,
+                    "TRCK": CARD_ACTIONS}
+        # strings[phase][player][id], None if the id is not an action of phase
+        self.strings, self.ids = {}, {}
+        for phase, mask in in_phase.items():
+            ids = [i for i in range(self.num_actions) if mask >> i & 1]
+            self.strings[phase] = []
+            for player in range(4):
+                strings = [None] * self.num_actions
+                for i in ids:
+                    strings[i] = action = f"{player},{phase},{self.contents[i]}"
+                    self.ids[action] = i
+                self.strings[phase].append(strings)
+
+    def __reduce__(self):
+        # pickle by ruleset, the tables are rebuilt (once) on the other side
+        return action_space, (self.start_game_value, self.max_game_value)
+
+    def value_mask(self, game_value: int) -> int:
+        """Mask of all value actions legal with current game_value, "0" included."""
+        higher = (game_value - self.start_game_value) // 5 + 1
+        return (1 | ((1 << len(self.values)) - 1) >> higher << higher) << VALUE_BASE
+
+
+_SPACES = {}  # (start_game_value, max_game_value) -> ActionSpace
+
+
+def action_space(start_game_value: int, max_game_value: int) -> ActionSpace:
+    """Shared ActionSpace for a ruleset."""
+    key = (start_game_value, max_game_value)
+    space = _SPACES.get(key)
+    if space is None:
+        space = _SPACES[key] = ActionSpace(start_game_value, max_game_value)
+    return space
+
+
+def card_action(card_id: int) -> int:
+    """Action id of card number card_id (see cardmask)."""
+    return CARD_BASE + card_id
@@ -0,0 +1,315 @@
+"""
+Many independent games of MarjaPussi stepped in lockstep with NumPy.
+
+Same rules and action ids as MarjaPussi (see marjapussi.actions). Every game
+is a row of the state arrays, cards are boolean arrays over the card numbers
+of marjapussi.cardmask and colors are indices into COLORS, -1 means none.
+Needs numpy (pip install marjapussi[batch]).
+"""
+import numpy as np
+
+import marjapussi.actions as actions
+import marjapussi.cardmask as cardmask
+from marjapussi.actions import PHASES
+from marjapussi.cardmask import COLORS, CARDS
+from marjapussi.game import MarjaPussi
+
+PROV, PASS, PBCK, PRMO, QUES, ANSW, TRCK, DONE = range(len(PHASES))
+
+NUM_CARDS = len(CARDS)
+COLOR_OF = np.array([COLORS.index(col) for col in cardmask.COLOR_OF])
+RANK = np.array(cardmask.RANK)
+# masks indexed by color, the last row is no color so -1 works as index
+COLOR_MASK = np.array([[cardmask.COLOR_MASK[col] >> i & 1 for i in range(NUM_CARDS)]
+                       for col in COLORS + [""]], dtype=bool)
+PAIR_MASK = np.array([[cardmask.PAIR_MASK[col] >> i & 1 for i in range(NUM_CARDS)]
+                      for col in COLORS], dtype=bool)
+ACES = np.array([cardmask.ACES >> i & 1 for i in range(NUM_CARDS)], dtype=bool)
+# BEATEN_BY[sup][card] like cardmask.BEATEN_BY
+BEATEN_BY = np.array([[[beaten >> i & 1 for i in range(NUM_CARDS)] for beaten in cardmask.BEATEN_BY[col]]
+                      for col in COLORS + [""]], dtype=bool)
+
+PAIR_CALLS = np.array([actions.PAIR_CALL[col] for col in COLORS])
+HALF_CALLS = np.array([actions.HALF_CALL[col] for col in COLORS])
+NO_HALF_CALLS = np.array([actions.NO_HALF_CALL[col] for col in COLORS])
+YOU = actions.CALL_ID["you"]
+NO_PAIR = actions.CALL_ID["nmy"]
+CALL_COLOR = np.array([COLORS.index(call[-1]) if call[-1] in COLORS else -1 for call in actions.CALLS])
+
+
+def masks_to_cards(masks) -> np.ndarray:
+    """Boolean card arrays of card masks (ints), one more trailing dimension."""
+    masks = np.asarray(masks, dtype=np.uint64)
+    return (masks[..., None] >> np.arange(NUM_CARDS, dtype=np.uint64) & np.uint64(1)).astype(bool)
+
+
+def _first_nonempty(*masks) -> np.ndarray:
+    """Row wise the first of masks with any card set, the last one otherwise."""
+    result = masks[-1]
+    for mask in masks[-2::-1]:
+        result = np.where(mask.any(axis=1, keepdims=True), mask, result)
+    return result
+
+
+class BatchMarjaPussi():
+    """
+    n games in lockstep. legal_mask() returns a (n, num_actions) boolean array, step() takes
+    one action id per game and ignores games already DONE, reset() deals new cards.
+    """
+
+    def __init__(self, n: int, override_rules={}, seed=None) -> None:
+        self.n = n
+        self.rules = MarjaPussi.DEFAULT_RULES | dict(override_rules)
+        self.action_space = actions.action_space(self.rules["start_game_value"], self.rules["max_game_value"])
+        self.num_actions = self.action_space.num_actions
+        self.values = np.array(self.action_space.values)
+        points = self.rules["points"]
+        self.card_points = np.array([points[val] for val in cardmask.VALUE_OF])
+        self.sup_points = np.array([points[col] for col in COLORS])
+        self.last_points = points["L"]
+        self.rng = np.random.default_rng(seed)
+
+        self.hands = np.zeros((n, 4, NUM_CARDS), dtype=bool)
+        self.phase = np.full(n, PHASES.index(self.rules["start_phase"]), dtype=np.int8)
+        self.turn = np.zeros(n, dtype=np.int8)
+        self.playing = np.full(n, -1, dtype=np.int8)  # -1 as long as no one plays
+        self.game_value = np.full(n, self.rules["start_game_value"], dtype=np.int16)
+        self.still_prov = np.ones((n, 4), dtype=bool)
+        self.forth = np.zeros((n, NUM_CARDS), dtype=bool)  # passed cards
+        self.back = np.zeros((n, NUM_CARDS), dtype=bool)
+        self.trick = np.full((n, 4), -1, dtype=np.int8)  # card numbers in order of play
+        self.trick_len = np.zeros(n, dtype=np.int8)
+        self.trick_num = np.ones(n, dtype=np.int8)  # len(MarjaPussi.tricks)
+        self.sup = np.full(n, -1, dtype=np.int8)
+        self.all_sup = np.zeros((n, 4), dtype=bool)  # colors that have been superior
+        self.asking = np.zeros((n, 4), dtype=np.int8)
+        self.question = np.full(n, -1, dtype=np.int8)  # YOU or the color asked for
+        self.sup_calls = np.zeros((n, 4, 4), dtype=bool)  # [game, player, color]
+        self.points = np.zeros((n, 4), dtype=np.int32)
+        self._legal = None
+        self.reset()
+
+    def reset(self, games=None, hands=None) -> None:
+        """
+        Starts new games at the indices (or boolean mask) games, all games by default.
+        hands are 4 card masks per game (see cardmask), randomly dealt if None.
+        """
+        games = np.arange(self.n) if games is None else np.asarray(games)
+        if games.dtype == bool:
+            games = np.nonzero(games)[0]
+        k = len(games)
+        if hands is None:
+            deck = self.rng.permuted(np.tile(np.arange(NUM_CARDS), (k, 1)), axis=1)
+            owner = np.empty((k, NUM_CARDS), dtype=np.int8)
+            owner[np.arange(k)[:, None], deck] = np.arange(NUM_CARDS) % 4
+            self.hands[games] = owner[:, None, :] == np.arange(4)[:, None]
+        else:
+            self.hands[games] = masks_to_cards(hands)
+        self.phase[games] = PHASES.index(self.rules["start_phase"])
+        self.turn[games] = 0
+        self.playing[games] = -1
+        self.game_value[games] = self.rules["start_game_value"]
+        self.still_prov[games] = True
+        self.forth[games] = self.back[games] = False
+        self.trick[games] = -1
+        self.trick_len[games] = 0
+        self.trick_num[games] = 1
+        self.sup[games] = -1
+        self.all_sup[games] = False
+        self.asking[games] = 0
+        self.question[games] = -1
+        self.sup_calls[games] = False
+        self.points[games] = 0
+        self._legal = None
+
+    def party_points(self) -> np.ndarray:
+        """(n, 2) points of the parties of player 0 and player 1."""
+        return self.points[:, [0, 1]] + self.points[:, [2, 3]]
+
+    def legal_mask(self) -> np.ndarray:
+        """(n, num_actions) legal action ids of every game, cached until the next step."""
+        if self._legal is None:
+            legal = np.zeros((self.n, self.num_actions), dtype=bool)
+            for phase in (PROV, PRMO):
+                games = np.nonzero(self.phase == phase)[0]
+                legal[games, actions.VALUE_BASE:] = self._legal_values(games)
+            for phase, passed in ((PASS, self.forth), (PBCK, self.back)):
+                games = np.nonzero(self.phase == phase)[0]
+                legal[games, actions.CARD_BASE:actions.VALUE_BASE] = \
+                    self.hands[games, self.turn[games]] & ~passed[games]
+            games = np.nonzero((self.phase == TRCK) | (self.phase == QUES))[0]
+            legal[games, actions.CARD_BASE:actions.VALUE_BASE] = self._legal_cards(games)
+            games = np.nonzero(self.phase == QUES)[0]
+            legal[games, :actions.CARD_BASE] = self._legal_questions(games)
+            games = np.nonzero(self.phase == ANSW)[0]
+            legal[games, :actions.CARD_BASE] = self._legal_answers(games)
+            self._legal = legal
+        return self._legal
+
+    def _legal_values(self, games) -> np.ndarray:
+        return (self.values > self.game_value[games, None]) | (self.values == 0)
+
+    def _has_pair(self, games, players) -> np.ndarray:
+        """(k, 4) colors of which players have the pair."""
+        return (self.hands[games, players][:, None, :] & PAIR_MASK).sum(axis=2) == 2
+
+    def _trick_best(self, games) -> np.ndarray:
+        """Position of the winning card in the (unfinished) trick of every game."""
+        cards = self.trick[games]
+        col = COLOR_OF[cards]
+        priority = np.where(col == self.sup[games, None], 2, col == col[:, :1])
+        score = priority * 10 + 9 - RANK[cards]
+        score[np.arange(4) >= self.trick_len[games, None]] = -1
+        return score.argmax(axis=1)
+
+    def _legal_cards(self, games) -> np.ndarray:
+        """cardmask.allowed_mask for the player at turn."""
+        hand = self.hands[games, self.turn[games]]
+        first = (self.trick_num[games] == 1)[:, None]
+        sup = self.sup[games]
+        # lead a trick
+        lead_first = _first_nonempty(hand & ACES, hand & COLOR_MASK[COLORS.index("g")], hand)
+        leading = np.where(first, lead_first, hand)
+        # follow
+        lead = COLOR_MASK[COLOR_OF[self.trick[games, 0]]]
+        ace = hand & lead & ACES & first
+        allowed = _first_nonempty(hand & lead, hand & COLOR_MASK[sup])
+        best = self.trick[games, self._trick_best(games)]
+        following = _first_nonempty(ace, allowed & BEATEN_BY[sup, best], allowed, hand)
+        return np.where((self.trick_len[games] == 0)[:, None], leading, following)
+
+    def _legal_questions(self, games) -> np.ndarray:
+        legal = np.zeros((len(games), actions.CARD_BASE), dtype=bool)
+        level = self.asking[games, self.turn[games]]
+        legal[:, PAIR_CALLS] = self._has_pair(games, self.turn[games]) & ~self.all_sup[games] \
+            & (level == 0)[:, None]
+        legal[:, YOU] = level <= 1
+        legal[:, HALF_CALLS] = (level <= 2)[:, None]
+        return legal
+
+    def _legal_answers(self, games) -> np.ndarray:
+        legal = np.zeros((len(games), actions.CARD_BASE), dtype=bool)
+        rows = np.arange(len(games))
+        hand = self.hands[games, self.turn[games]]
+        col = self.question[games]
+        pair = self._has_pair(games, self.turn[games]) & ~self.all_sup[games]
+        pair_question = col == YOU
+        legal[:, PAIR_CALLS] = pair & pair_question[:, None]
+        legal[:, NO_PAIR] = pair_question & ~pair.any(axis=1)
+        half = (hand & PAIR_MASK[col % 4]).any(axis=1)
+        legal[rows, HALF_CALLS[col % 4]] = ~pair_question & half
+        legal[rows, NO_HALF_CALLS[col % 4]] = ~pair_question & ~half
+        return legal
+
+    def step(self, action_ids) -> np.ndarray:
+        """
+        Acts action_ids[i] in game i, raises ValueError if one of them is illegal.
+        Returns the boolean mask of games finished by this step.
+        """
+        action_ids = np.asarray(action_ids)
+        games = np.nonzero(self.phase != DONE)[0]
+        if not self.legal_mask()[games, action_ids[games]].all():
+            raise ValueError("Not a legal action!")
+        phase, ids = self.phase[games], action_ids[games]
+        self._legal = None
+        self._step_prov(games[phase == PROV], ids[phase == PROV])
+        self._step_pass(games[phase == PASS], ids[phase == PASS], self.forth, PBCK)
+        self._step_pass(games[phase == PBCK], ids[phase == PBCK], self.back, PRMO)
+        self._step_prmo(games[phase == PRMO], ids[phase == PRMO])
+        card = ids >= actions.CARD_BASE
+        play = (phase == TRCK) | (phase == QUES) & card
+        self._step_trck(games[play], ids[play])
+        self._step_ques(games[(phase == QUES) & ~card], ids[(phase == QUES) & ~card])
+        self._step_answ(games[phase == ANSW], ids[phase == ANSW])
+        done = np.zeros(self.n, dtype=bool)
+        done[games] = self.phase[games] == DONE
+        return done
+
+    def _step_prov(self, games, ids) -> None:
+        rows = np.arange(len(games))
+        player = self.turn[games]
+        value = self.values[ids - actions.VALUE_BASE]
+        higher = value > self.game_value[games]
+        self.game_value[games] = np.where(higher, value, self.game_value[games])
+        self.still_prov[games, player] &= higher
+        still_prov = self.still_prov[games]
+        left = still_prov.sum(axis=1)
+        at_start = self.game_value[games] == self.rules["start_game_value"]
+        go_on = (left > 1) | (left == 1) & at_start
+        # next player still provoking, the player itself last
+        order = (player[:, None] + np.arange(1, 5)) % 4
+        next_player = order[rows, still_prov[rows[:, None], order].argmax(axis=1)]
+        takes = ~go_on & ~at_start
+        taker = still_prov.argmax(axis=1)
+        self.turn[games] = np.where(go_on, next_player, np.where(takes, (taker + 2) % 4, 0))
+        self.playing[games] = np.where(takes, taker, self.playing[games])
+        self.phase[games] = np.where(go_on, PROV, np.where(takes, PASS, TRCK))
+
+    def _step_pass(self, games, ids, passed, next_phase) -> None:
+        passed[games, ids - actions.CARD_BASE] = True
+        games = games[passed[games].sum(axis=1) == 4]
+        giver, playing = self.turn[games], self.playing[games]
+        cards = passed[games]
+        self.hands[games, giver] &= ~cards
+        self.hands[games, (giver + 2) % 4] |= cards
+        self.turn[games] = playing
+        self.phase[games] = next_phase
+
+    def _step_prmo(self, games, ids) -> None:
+        value = self.values[ids - actions.VALUE_BASE]
+        self.game_value[games] = np.maximum(value, self.game_value[games])
+        self.phase[games] = TRCK
+
+    def _step_trck(self, games, ids) -> None:
+        player = self.turn[games]
+        cards = ids - actions.CARD_BASE
+        self.hands[games, player, cards] = False
+        self.trick[games, self.trick_len[games]] = cards
+        self.trick_len[games] += 1
+        self.turn[games] = (player + 1) % 4
+        self.phase[games] = TRCK
+        games = games[self.trick_len[games] == 4]
+        # player at turn has led the trick
+        winner = (self.turn[games] + self._trick_best(games)) % 4
+        last = self.trick_num[games] == NUM_CARDS // 4
+        self.points[games, winner] += self.card_points[self.trick[games]].sum(axis=1) + last * self.last_points
+        self.turn[games] = winner
+        self.phase[games] = np.where(last, DONE, QUES)
+        self.trick_num[games] += ~last
+        self.trick_len[games] = 0
+        self.trick[games] = -1
+
+    def _call_sup(self, games, players, cols) -> None:
+        """Player.call_sup, points go to the player calling or asking."""
+        new = ~self.sup_calls[games, players, cols]
+        self.sup_calls[games, players, cols] = True
+        self.points[games, players] += new * self.sup_points[cols]
+
+    def _make_sup(self, games, players, cols) -> None:
+        self.sup[games] = cols
+        self.all_sup[games, cols] = True
+        self._call_sup(games, players, cols)
+
+    def _step_ques(self, games, ids) -> None:
+        player = self.turn[games]
+        pair = ids < YOU
+        self._make_sup(games[pair], player[pair], CALL_COLOR[ids[pair]])
+        self.phase[games[pair]] = TRCK
+        games, player, ids = games[~pair], player[~pair], ids[~pair]
+        self.asking[games, player] = np.where(ids == YOU, 1, 2)
+        self.question[games] = np.where(ids == YOU, YOU, CALL_COLOR[ids])
+        self.turn[games] = (player + 2) % 4
+        self.phase[games] = ANSW
+
+    def _step_answ(self, games, ids) -> None:
+        player = self.turn[games]
+        asker = (player + 2) % 4
+        cols = CALL_COLOR[ids]
+        pair = ids < YOU
+        half = np.isin(ids, HALF_CALLS)
+        # the asker has to have a half too
+        half[half] = (self.hands[games[half], asker[half]] & PAIR_MASK[cols[half]]).any(axis=1)
+        sup = pair | half
+        self._make_sup(games[sup], player[sup], cols[sup])
+        self.turn[games] = asker
+        self.phase[games] = TRCK
@@ -0,0 +1,311 @@
+"""
+Bots choosing an action for the player at turn.
+
+A policy is any callable taking a MarjaPussi and returning one of its legal
+actions. PIMCBot only uses what the player at turn knows: it samples deals
+of the unseen cards that are consistent with everything that happened so far
+and evaluates every legal action on these deals with rollouts or the double
+dummy solver.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import marjapussi.actions as actions
+import marjapussi.cardmask as cardmask
+from marjapussi.exchange import exchange_policy
+from marjapussi.cardmask import COLORS
+from marjapussi.game import MarjaPussi
+from marjapussi.solver import solve
+
+
+def random_policy(game) -> str:
+    return random.choice(game.legal_actions())
+
+
+def greedy_policy(game) -> str:
+    """
+    Simple rules: never bid, pass good cards forth and bad ones back, announce pairs,
+    ask for pairs and halves, take tricks as cheaply as possible and give points to a
+    partner who wins the trick.
+    """
+    ids = game.legal_action_ids()
+    if len(ids) == 1 or game.phase in ("PROV", "PRMO"):
+        # "0" has the lowest id of all values
+        return game.action_str(ids[0])
+    player = game.player_at_turn
+    points = [game.rules["points"][val] for val in cardmask.VALUE_OF]
+    calls = [i for i in ids if i < actions.CARD_BASE]
+    cards = [i - actions.CARD_BASE for i in ids if actions.CARD_BASE <= i < actions.VALUE_BASE]
+    if game.phase == "PASS":
+        card = max(cards, key=lambda c: (points[c], -cardmask.RANK[c]))
+    elif game.phase == "PBCK":
+        pairs = sum(cardmask.PAIR_MASK[col] for col in COLORS if cardmask.has_half(player.hand, col))
+        card = min(cards, key=lambda c: (pairs >> c & 1, points[c], -cardmask.RANK[c]))
+    elif game.phase == "ANSW":
+        # highest pair first
+        return game.action_str(calls[0])
+    else:
+        call = _greedy_call(game, calls)
+        if call is not None:
+            return game.action_str(call)
+        card = _greedy_card(game, cards, points)
+    return game.action_str(actions.card_action(card))
+
+
+def _greedy_call(game, calls):
+    player = game.player_at_turn
+    for call in calls:
+        content = game.action_space.contents[call]
+        if content[:2] == "my":
+            return call
+        if content == "you" and player.asking == 0:
+            return call
+        if content[:2] == "ou" and content[2] not in game.all_sup and cardmask.has_half(player.hand, content[2]):
+            return call
+    return None
+
+
+def _greedy_card(game, cards, points):
+    trick = game.trick_ids
+    if not trick:
+        aces = [c for c in cards if cardmask.RANK[c] == 0]
+        return aces[0] if aces else min(cards, key=lambda c: (points[c], -cardmask.RANK[c]))
+    best, win = cardmask.trick_winner(trick, sup_col=game.sup_col)
+    turn = game.player_at_turn.number
+    if (turn - len(trick) + win) % 2 == turn % 2:
+        # partner wins
+        return max(cards, key=lambda c: (points[c], -cardmask.RANK[c]))
+    winning = [c for c in cards if cardmask.beats(best, c, sup_col=game.sup_col)]
+    if winning:
+        return min(winning, key=lambda c: (points[c], -cardmask.RANK[c]))
+    return min(cards, key=lambda c: (points[c], -cardmask.RANK[c]))
+
+
+class Determinizer():
+    """Samples the hidden cards from the view of seat."""
+
+    def __init__(self, game, seat: int) -> None:
+        self.game = game
+        self.seat = seat
+        self.played_by = [0] * 4
+        self.forbidden = [0] * 4  # cards a player can't have any more
+        self.fixed = [0] * 4  # unplayed cards known to be in a hand
+        lead, in_trick = None, 0
+        for action in game.all_actions:
+            player, phase, content = action.split(",")
+            player = int(player)
+            if phase == "TRCK":
+                self.played_by[player] |= cardmask.CARD_BIT[content]
+                if in_trick == 0:
+                    lead = content[0]
+                elif content[0] != lead:
+                    # failed to follow
+                    self.forbidden[player] |= cardmask.COLOR_MASK[lead]
+                in_trick = (in_trick + 1) % 4
+            elif content[:2] == "my":
+                self.fixed[player] |= cardmask.PAIR_MASK[content[2]]
+            elif content[:2] == "no" and content != "nmy":
+                self.forbidden[player] |= cardmask.PAIR_MASK[content[2]]
+        played = game.played
+        self.forth, self.back = game.passed_cards["forth"], game.passed_cards["back"]
+        self.playing = game.playing_player.number if game.playing_player else None
+        self.partner = None if self.playing is None else (self.playing + 2) % 4
+        self.in_party = seat in (self.playing, self.partner)
+        if self.in_party:
+            # both players of the playing party know where the passed cards went
+            for c in self.forth:
+                self.fixed[self.playing if len(self.forth) == 4 else self.partner] |= cardmask.CARD_BIT[c]
+            for c in self.back:
+                bit = cardmask.CARD_BIT[c]
+                self.fixed[self.playing] &= ~bit
+                self.fixed[self.partner if len(self.back) == 4 else self.playing] |= bit
+        self.fixed = [fixed & ~played for fixed in self.fixed]
+        self.fixed[seat] = game.players[seat].hand
+        self.unknown = cardmask.ALL_CARDS & ~played & ~(self.fixed[0] | self.fixed[1] | self.fixed[2] | self.fixed[3])
+        # hand sizes are public
+        self.need = [cardmask.count(p.hand) - cardmask.count(self.fixed[p.number]) for p in game.players]
+
+    def sample(self, rng, tries=50):
+        """
+        A MarjaPussi in the current state with sampled hidden cards that replays every action
+        of the game legally. Falls back to a sample only respecting known voids.
+        """
+        world = None
+        for _ in range(tries):
+            hands = self._sample_hands(rng)
+            if hands is None:
+                continue
+            world = self._replay(hands, rng)
+            if world is not None:
+                return world
+        hands = self._sample_hands(rng) or self._sample_hands(rng, respect=False)
+        world = self.game.clone()
+        world.set_hands(hands)
+        return world
+
+    def _sample_hands(self, rng, respect=True):
+        cards = cardmask.ids_of(self.unknown)
+        rng.shuffle(cards)
+        forbidden = self.forbidden if respect else [0] * 4
+        players = [p for p in range(4) if p != self.seat]
+        # most constrained cards first
+        cards.sort(key=lambda c: sum(1 for p in players if not forbidden[p] >> c & 1))
+        need = self.need[:]
+        hands = self.fixed[:]
+        for card in cards:
+            options = [p for p in players if need[p] and not forbidden[p] >> card & 1]
+            if not options:
+                return None
+            player = rng.choices(options, weights=[need[p] for p in options])[0]
+            hands[player] |= 1 << card
+            need[player] -= 1
+        return hands
+
+    def _replay(self, hands, rng):
+        """Deals the sampled cards and replays all actions, None if one of them is illegal."""
+        held = [hand | played for hand, played in zip(hands, self.played_by)]
+        forth, back = self.forth, self.back
+        if self.playing is not None and not self.in_party:
+            # any passed cards are consistent, pick them from the sampled hands
+            forth = rng.sample(cardmask.cards_of(held[self.playing if len(forth) == 4 else self.partner]),
+                               len(forth))
+            back = rng.sample(cardmask.cards_of(held[self.partner if len(back) == 4 else self.playing]
+                                                & ~cardmask.mask_of(forth)), len(back))
+        # undo passing back first, cards can be passed back and forth
+        deal = held[:]
+        if len(back) == 4:
+            deal[self.partner] &= ~cardmask.mask_of(back)
+            deal[self.playing] |= cardmask.mask_of(back)
+        if len(forth) == 4:
+            deal[self.playing] &= ~cardmask.mask_of(forth)
+            deal[self.partner] |= cardmask.mask_of(forth)
+        world = MarjaPussi([p.name for p in self.game.players], override_rules=MarjaPussi.rules_dict(self.game.rules),
+                           log=False, deal=[cardmask.cards_of(hand) for hand in deal])
+        passes = {"PASS": iter(forth), "PBCK": iter(back)}
+        for action in self.game.all_actions:
+            player, phase, content = action.split(",")
+            if phase in passes:
+                action = f"{player},{phase},{next(passes[phase])}"
+            if not world.is_legal(action):
+                return None
+            world.act_action(action)
+        # announced trumps are public, the sampled halves have to agree
+        if world.sup_col != self.game.sup_col or \
+                [p.points_made for p in world.players] != [p.points_made for p in self.game.players]:
+            return None
+        return world
+
+
+def _evaluate(world, seat, candidates, rollouts, solver_tricks, seed, deadline=None):
+    """
+    Average final points of the party of seat after each candidate action, or None if
+    deadline (a time.time(), shared by all processes) passes before every candidate had a
+    rollout. Rollouts stop at deadline, solving only starts before it.
+    """
+    if deadline is not None and time.time() > deadline:
+        return None
+    if world.phase in ("QUES", "ANSW", "TRCK") and 10 - len(world.tricks) <= solver_tricks:
+        values = solve(world)
+        return [values[world.action_str(c)] for c in candidates]
+    rng = random.Random(seed)
+    sums, counts = [0] * len(candidates), [0] * len(candidates)
+    for _ in range(rollouts):
+        # one rollout per candidate at a time, so all of them get about the same number
+        for i, action_id in enumerate(candidates):
+            if deadline is not None and time.time() > deadline:
+                return [total / n for total, n in zip(sums, counts)] if counts[-1] else None
+            game = world.clone()
+            game.act_action_id(action_id)
+            while game.phase != "DONE":
+                game.act_action_id(rng.choice(game.legal_action_ids()))
+            sums[i] += game.players[seat].points_made + game.players[(seat + 2) % 4].points_made
+            counts[i] += 1
+    return [total / rollouts for total in sums]
+
+
+class PIMCBot():
+    """
+    Perfect information Monte Carlo: average the final points of the own party over
+    sampled deals for every legal action. Deals are evaluated with random rollouts, or
+    solved exactly once at most solver_tricks tricks are left. With workers > 0 deals
+    are evaluated in a process pool, call close() when done. max_time limits the seconds
+    of a decision, evaluations in the pool stop at the deadline too. With search_exchange the
+    cards of PASS and PBCK are chosen by exchange.exchange_policy instead.
+    """
+
+    def __init__(self, determinizations=20, rollouts=4, max_time=None, solver_tricks=3,
+                 workers=0, seed=None, search_exchange=True) -> None:
+        self.determinizations = determinizations
+        self.rollouts = rollouts
+        self.max_time = max_time
+        self.solver_tricks = solver_tricks
+        self.search_exchange = search_exchange
+        self.rng = random.Random(seed)
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(workers) if workers else None
+
+    def __call__(self, game) -> str:
+        candidates = game.legal_action_ids()
+        if len(candidates) == 1:
+            return game.action_str(candidates[0])
+        if self.search_exchange and game.phase in ("PASS", "PBCK"):
+            return exchange_policy(game)
+        values = self.action_values(game)
+        return max(values, key=values.get)
+
+    def action_values(self, game) -> dict:
+        """Average final points of the own party for every legal action."""
+        # wall clock, so processes of the pool can check it as well
+        deadline = None if self.max_time is None else time.time() + self.max_time
+        seat = game.player_at_turn.number
+        candidates = game.legal_action_ids()
+        determinizer = Determinizer(game, seat)
+        tasks = ((determinizer.sample(self.rng), seat, candidates, self.rollouts, self.solver_tricks,
+                  self.rng.getrandbits(64), deadline) for _ in range(self.determinizations))
+        sums, done = [0] * len(candidates), 0
+        for result in self._run(tasks, deadline):
+            if result is not None:
+                sums = [s + r for s, r in zip(sums, result)]
+                done += 1
+        done = max(done, 1)
+        return {game.action_str(c): s / done for c, s in zip(candidates, sums)}
+
+    def _run(self, tasks, deadline):
+        if self.executor is None:
+            for task in tasks:
+                yield _evaluate(*task)
+                if deadline is not None and time.time() > deadline:
+                    return
+            return
+        # deals are sampled here, only sample and submit a few ahead of the workers
+        tasks, pending = iter(tasks), set()
+        while True:
+            while len(pending) < 2 * self.workers and (deadline is None or time.time() < deadline):
+                task = next(tasks, None)
+                if task is None:
+                    break
+                pending.add(self.executor.submit(_evaluate, *task))
+            if not pending:
+                return
+            timeout = None if deadline is None else max(0, deadline - time.time())
+            finished, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+            if not finished:
+                # evaluations still running stop at the deadline by themselves, collect them so
+                # the pool is free for the next decision
+                for future in pending:
+                    yield future.result()
+                return
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
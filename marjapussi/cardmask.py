@@ -0,0 +1,119 @@
+"""
+Integer bitmask core for cards, hands and tricks.
+
+Card number i is CARDS[i] and is represented by the bit 1 << i, so a set of
+cards is a single int. Bits are ordered like CARDS, iterating over the set
+bits of a mask therefore yields the cards already sorted.
+"""
+
+COLORS = [c for c in "rseg"]
+VALUES = [v for v in "AZKOU9876"]
+CARDS = [c + "-" + v for c in COLORS for v in VALUES]
+
+CARD_ID = {card: i for i, card in enumerate(CARDS)}
+CARD_BIT = {card: 1 << i for i, card in enumerate(CARDS)}
+ALL_CARDS = (1 << len(CARDS)) - 1
+
+# color and value of every card number
+COLOR_OF = [card[0] for card in CARDS]
+VALUE_OF = [card[2] for card in CARDS]
+
+COLOR_MASK = {col: sum(CARD_BIT[f"{col}-{val}"] for val in VALUES) for col in COLORS}
+COLOR_MASK[""] = 0  # no superior color
+VALUE_MASK = {val: sum(CARD_BIT[f"{col}-{val}"] for col in COLORS) for val in VALUES}
+ACES = VALUE_MASK["A"]
+PAIR_MASK = {col: CARD_BIT[f"{col}-K"] | CARD_BIT[f"{col}-O"] for col in COLORS}
+
+# rank of every value and card, 0 is the highest
+VALUE_RANK = {val: rank for rank, val in enumerate(VALUES)}
+RANK = [VALUE_RANK[val] for val in VALUE_OF]
+
+# all cards of the same color with a higher value, VALUES is ordered high to low
+ABOVE = [COLOR_MASK[COLOR_OF[i]] & ((1 << i) - 1) for i in range(len(CARDS))]
+
+# BEATEN_BY[sup_col][i] is the mask of all cards taking a trick from card i
+BEATEN_BY = {sup_col: [ABOVE[i] | (COLOR_MASK[sup_col] if COLOR_OF[i] != sup_col else 0)
+                       for i in range(len(CARDS))]
+             for sup_col in COLOR_MASK}
+
+
+def mask_of(cards) -> int:
+    mask = 0
+    for card in cards:
+        mask |= CARD_BIT[card]
+    return mask
+
+
+def ids_of(mask) -> list:
+    """Card numbers of all cards in mask, ascending."""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+def cards_of(mask) -> list:
+    """Sorted card strings of all cards in mask."""
+    return [CARDS[i] for i in ids_of(mask)]
+
+
+def count(mask) -> int:
+    return bin(mask).count("1")
+
+
+def has_pair(hand, col) -> bool:
+    return hand & PAIR_MASK[col] == PAIR_MASK[col]
+
+
+def has_half(hand, col) -> bool:
+    return bool(hand & PAIR_MASK[col])
+
+
+def trick_mask(trick) -> int:
+    mask = 0
+    for i in trick:
+        mask |= 1 << i
+    return mask
+
+
+def winning_card(lead, mask, sup_col="") -> int:
+    """
+    Card number winning a trick, given the lead color, the mask of all cards
+    played so far and the superior color.
+    """
+    win = mask & COLOR_MASK[sup_col] if sup_col and sup_col != lead else 0
+    win = win or mask & COLOR_MASK[lead]
+    # highest value has the lowest card number
+    return (win & -win).bit_length() - 1
+
+
+def trick_winner(trick, sup_col="") -> tuple:
+    """Winning card number and its index in trick, a list of card numbers."""
+    card = winning_card(COLOR_OF[trick[0]], trick_mask(trick), sup_col or "")
+    return card, trick.index(card)
+
+
+def beats(best, card, sup_col="") -> bool:
+    """Returns True if card number card takes the trick from card number best."""
+    return bool(BEATEN_BY[sup_col or ""][best] >> card & 1)
+
+
+def allowed_mask(trick, hand, sup_col="", first=False) -> int:
+    """
+    Mask of all cards in hand that may be played on trick (card numbers).
+    Same rules as utils.allowed_general.
+    """
+    if not trick:
+        if first:
+            # first player has to play an ace, green or any card
+            return hand & ACES or hand & COLOR_MASK["g"] or hand
+        return hand
+    sup_col = sup_col or ""
+    lead = COLOR_OF[trick[0]]
+    if first and (ace := hand & COLOR_MASK[lead] & ACES):
+        return ace
+    allowed = hand & COLOR_MASK[lead] or hand & COLOR_MASK[sup_col]
+    best = winning_card(lead, trick_mask(trick), sup_col)
+    return allowed & BEATEN_BY[sup_col][best] or allowed or hand
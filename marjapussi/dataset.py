@@ -0,0 +1,191 @@
+"""
+Training data of finished games as columns of fixed size rows, one row per decision.
+
+DatasetWriter replays the end_info() of games (original cards and actions)
+and appends a row for every action taken:
+    obs      float32 (OBSERVATION_SIZE,)  observation of the seat at turn, see observation
+    legal    uint8 (ceil(num_actions / 8),)  legal action ids as little endian bits
+    action   int16   id of the action taken
+    seat     int8    player at turn
+    phase    int8    index in actions.PHASES
+    game     int32   number of the game in the dataset
+    points   float32 final points of the party of seat
+    outcome  int8    1 if the party of seat won, -1 if it lost, 0 if no one played
+Every column is a raw file in the dataset directory that is only appended to,
+meta.json holds the number of rows and is written last. Rows beyond it are
+from an interrupted flush and cut off by the next DatasetWriter. Dataset reads them memory-mapped. Needs numpy.
+"""
+import json
+import os
+
+import numpy as np
+
+from marjapussi.game import MarjaPussi
+from marjapussi.observation import OBSERVATION_SIZE, PHASE_ID, ObservationEncoder
+
+META = "meta.json"
+
+
+def _columns(num_actions) -> dict:
+    """name -> (dtype, width) of all columns."""
+    return {
+        "obs": ("float32", OBSERVATION_SIZE),
+        "legal": ("uint8", (num_actions + 7) // 8),
+        "action": ("int16", 1),
+        "seat": ("int8", 1),
+        "phase": ("int8", 1),
+        "game": ("int32", 1),
+        "points": ("float32", 1),
+        "outcome": ("int8", 1),
+    }
+
+
+def game_rows(info, override_rules={}) -> dict:
+    """Columns of all decisions in the game of info, an end_info() dict."""
+    game = MarjaPussi(info["players"], override_rules=override_rules, log=False,
+                      deal=[info["cards"][name] for name in info["players"]])
+    encoders = [ObservationEncoder(game, seat) for seat in range(4)]
+    n, space = len(info["actions"]), game.action_space
+    legal_bytes = (space.num_actions + 7) // 8
+    obs = np.empty((n, OBSERVATION_SIZE), dtype=np.float32)
+    legal = bytearray()
+    action, seat, phase = (np.empty(n, dtype=dtype) for dtype in (np.int16, np.int8, np.int8))
+    for i, act in enumerate(info["actions"]):
+        seat[i] = game.player_at_turn.number
+        phase[i] = PHASE_ID[game.phase]
+        obs[i] = encoders[seat[i]].observation
+        legal += game.legal_mask().to_bytes(legal_bytes, "little")
+        action[i] = space.ids[act]
+        if not game.act_action(act):
+            raise ValueError(f"Game contains illegal action {act}.")
+    for encoder in encoders:
+        encoder.close()
+    if game.passed_cards != info["passed_cards"]:
+        raise ValueError("Actions don't match the passed cards of the game.")
+    points = [game.players[p].points_made + game.players[(p + 2) % 4].points_made for p in range(2)]
+    if game.no_one_plays:
+        outcome = [0, 0]
+    else:
+        playing = game.playing_player.number % 2
+        won = points[playing] >= game.game_value
+        outcome = [1 if won == (party == playing) else -1 for party in range(2)]
+    return {
+        "obs": obs,
+        "legal": np.frombuffer(bytes(legal), dtype=np.uint8).reshape(n, legal_bytes),
+        "action": action,
+        "seat": seat,
+        "phase": phase,
+        "points": np.array(points, dtype=np.float32)[seat % 2],
+        "outcome": np.array(outcome, dtype=np.int8)[seat % 2],
+    }
+
+
+class DatasetWriter():
+    """Appends the decisions of games to the dataset in directory, call close() when done."""
+
+    def __init__(self, directory, override_rules={}, buffer_rows=1 << 16) -> None:
+        self.directory = directory
+        self.override_rules = override_rules
+        self.buffer_rows = buffer_rows
+        num_actions = MarjaPussi(["P1", "P2", "P3", "P4"], override_rules=override_rules,
+                                 log=False).action_space.num_actions
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, META)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+            if self.meta["num_actions"] != num_actions:
+                raise ValueError(f"{directory} holds a dataset of other rules.")
+        else:
+            self.meta = {"rows": 0, "games": 0, "num_actions": num_actions,
+                         "columns": _columns(num_actions)}
+        # a flush that was interrupted leaves rows after meta["rows"] in some columns
+        for name, (dtype, width) in self.meta["columns"].items():
+            path = os.path.join(directory, name)
+            size = self.meta["rows"] * np.dtype(dtype).itemsize * width
+            if (os.path.getsize(path) if os.path.exists(path) else 0) < size:
+                raise ValueError(f"Column {name} of {directory} is shorter than {META} says.")
+            if size or os.path.exists(path):
+                os.truncate(path, size)
+        self.buffer = {name: [] for name in self.meta["columns"]}
+        self.buffered = 0
+
+    def add(self, info) -> None:
+        """Adds the game of info, an end_info() dict."""
+        rows = game_rows(info, self.override_rules)
+        rows["game"] = np.full(len(rows["action"]), self.meta["games"], dtype=np.int32)
+        self.meta["games"] += 1
+        for name, column in rows.items():
+            self.buffer[name].append(column)
+        self.buffered += len(rows["action"])
+        if self.buffered >= self.buffer_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the buffered rows, the dataset on disk is complete afterwards."""
+        if not self.buffered:
+            return
+        for name, columns in self.buffer.items():
+            with open(os.path.join(self.directory, name), "ab") as f:
+                np.concatenate(columns).tofile(f)
+            columns.clear()
+        self.meta["rows"] += self.buffered
+        self.buffered = 0
+        with open(os.path.join(self.directory, META), "w") as f:
+            json.dump(self.meta, f)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def export(infos, directory, override_rules={}) -> int:
+    """Appends all games of infos to the dataset in directory, returns the number of rows."""
+    with DatasetWriter(directory, override_rules) as writer:
+        for info in infos:
+            writer.add(info)
+    return writer.meta["rows"]
+
+
+class Dataset():
+    """Memory-mapped columns of a dataset written by DatasetWriter."""
+
+    def __init__(self, directory) -> None:
+        with open(os.path.join(directory, META)) as f:
+            self.meta = json.load(f)
+        self.num_actions = self.meta["num_actions"]
+        rows = self.meta["rows"]
+        self.columns = {}
+        for name, (dtype, width) in self.meta["columns"].items():
+            shape = (rows, width) if width > 1 else (rows,)
+            # rows written after the meta file was read are ignored
+            self.columns[name] = np.memmap(os.path.join(directory, name), dtype=dtype, mode="r",
+                                           shape=shape) if rows else np.empty(shape, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.meta["rows"]
+
+    def batch(self, rows) -> dict:
+        """Columns of rows (indices), legal unpacked to a (len(rows), num_actions) bool array."""
+        batch = {name: np.asarray(column[rows]) for name, column in self.columns.items()}
+        batch["legal"] = np.unpackbits(batch["legal"], axis=1, count=self.num_actions,
+                                       bitorder="little").astype(bool)
+        return batch
+
+    def sample(self, batch_size, rng=None) -> dict:
+        """Batch of random rows, rng is a numpy Generator."""
+        rng = np.random.default_rng() if rng is None else rng
+        # sorted rows read the files in order
+        return self.batch(np.sort(rng.integers(0, len(self), batch_size)))
+
+    def minibatches(self, batch_size, rng=None):
+        """Generator over batches of all rows in random order, one epoch."""
+        rng = np.random.default_rng() if rng is None else rng
+        order = rng.permutation(len(self))
+        for start in range(0, len(order), batch_size):
+            yield self.batch(np.sort(order[start:start + batch_size]))
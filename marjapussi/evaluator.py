@@ -0,0 +1,181 @@
+"""
+Hand strength for bidding, from precomputed tables.
+
+A hand is reduced to its aces, tens, pair colors and halves (see hand_index).
+The tables hold the average final points of the party taking the game for
+every such class of hands, once by the hand that was dealt (the exchange of
+PASS and PBCK still to come) and once by the hand after the exchange. They
+are built by simulating games where player 0 takes the game and everyone
+plays bot.greedy_policy:
+
+    python -m marjapussi.evaluator out.bin [games]
+
+The file is memory-mapped, it starts with a header and the rules the
+tables were built with (JSON), followed by the float32 means and uint32
+counts of both tables in little endian byte order.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import marjapussi.cardmask as cardmask
+from marjapussi.bot import greedy_policy
+from marjapussi.cardmask import COLORS
+from marjapussi.game import MarjaPussi
+from marjapussi.runner import run_games
+
+DEFAULT_TABLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hand_tables.bin")
+HEADER = struct.Struct("<4sHII")  # magic, version, cells, bytes of the rules padded to 4
+MAGIC = b"MPHE"
+VERSION = 2
+CELLS = 5 * 5 * 16 * 5
+MIN_COUNT = 30  # fewer samples fall back to the coarse table
+PLAYER_NAMES = ["P1", "P2", "P3", "P4"]
+
+
+def hand_index(hand) -> int:
+    """Class of hand (a card mask) by its aces, tens, pair colors and halves without pair."""
+    aces = cardmask.count(hand & cardmask.ACES)
+    tens = cardmask.count(hand & cardmask.VALUE_MASK["Z"])
+    pairs = halves = 0
+    for i, col in enumerate(COLORS):
+        if cardmask.has_pair(hand, col):
+            pairs |= 1 << i
+        elif cardmask.has_half(hand, col):
+            halves += 1
+    return ((aces * 5 + tens) * 16 + pairs) * 5 + halves
+
+
+def _coarse_index(index) -> int:
+    """Class by aces and pair colors only."""
+    return index // (5 * 16 * 5) * 16 + index // 5 % 16
+
+
+class HandEvaluator():
+    """Expected final points of the party of a player taking the game, read from a tables file."""
+
+    def __init__(self, path=DEFAULT_TABLES) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, cells, rules_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or cells != CELLS:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a hand tables file of version {VERSION}.")
+        self.rules = json.loads(self._mmap[HEADER.size:HEADER.size + rules_size])
+        self._view = view = memoryview(self._mmap)[HEADER.size + rules_size:]
+        size = 4 * CELLS
+        self._tables = []
+        for i in range(2):
+            means = view[2*i*size:(2*i + 1)*size]
+            counts = view[(2*i + 1)*size:(2*i + 2)*size]
+            if sys.byteorder == "little":
+                means, counts = means.cast("f"), counts.cast("I")
+            else:
+                # the file is little endian, copy and swap the tables
+                means, counts = array("f", bytes(means)), array("I", bytes(counts))
+                means.byteswap()
+                counts.byteswap()
+            self._tables.append((means, counts, self._coarse(means, counts)))
+
+    @staticmethod
+    def _coarse(means, counts) -> tuple:
+        sums, totals = [0.0] * 80, [0] * 80
+        for index in range(CELLS):
+            sums[_coarse_index(index)] += means[index] * counts[index]
+            totals[_coarse_index(index)] += counts[index]
+        overall = sum(sums) / max(sum(totals), 1)
+        return [s / t if t >= MIN_COUNT else overall for s, t in zip(sums, totals)]
+
+    def _lookup(self, table, hand) -> float:
+        means, counts, coarse = self._tables[table]
+        index = hand_index(hand)
+        return means[index] if counts[index] >= MIN_COUNT else coarse[_coarse_index(index)]
+
+    def expected_points(self, hand) -> float:
+        """Expected points when taking the game with the dealt hand, the exchange included."""
+        return self._lookup(0, hand)
+
+    def after_exchange(self, hand) -> float:
+        """Expected points of the playing party with hand after PASS and PBCK."""
+        return self._lookup(1, hand)
+
+    def exchange_gain(self, hand) -> float:
+        """How much the exchange is worth for a dealt hand, compared to playing it as it is."""
+        return self.expected_points(hand) - self.after_exchange(hand)
+
+    def bid(self, game, margin=0) -> str:
+        """
+        Action for the player at turn in PROV or PRMO: in PROV the smallest raise as long as
+        the expected points minus margin reach it, in PRMO the highest value they reach.
+        """
+        if MarjaPussi.rules_dict(game.rules) != self.rules:
+            raise ValueError("The tables were built for other rules than the rules of game.")
+        player = game.player_at_turn
+        if game.phase == "PROV":
+            target = self.expected_points(player.hand) - margin
+            value = game.game_value + 5
+        elif game.phase == "PRMO":
+            target = self.after_exchange(player.hand) - margin
+            value = max([v for v in game.action_space.values if v <= target] + [0])
+        else:
+            raise ValueError(f"Can only bid in PROV and PRMO, game is in phase {game.phase}.")
+        if value <= game.game_value or value > target or value > game.rules["max_game_value"]:
+            value = 0
+        return f"{player.number},{game.phase},{value}"
+
+    def close(self) -> None:
+        for means, counts, _ in self._tables:
+            if isinstance(means, memoryview):
+                means.release()
+                counts.release()
+        self._tables = []
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def taking_policy(game) -> str:
+    """Player 0 takes the game for the lowest value, everyone else passes, then greedy_policy."""
+    if game.phase == "PROV":
+        player = game.player_at_turn.number
+        start = game.rules["start_game_value"]
+        return f"{player},PROV,{start + 5 if player == 0 and game.game_value == start else 0}"
+    return greedy_policy(game)
+
+
+def build_tables(path, games, workers=None, seed=0, override_rules={}) -> None:
+    """Simulates games with taking_policy and writes the tables to path."""
+    sums = [[0.0] * CELLS, [0.0] * CELLS]
+    counts = [array("I", [0] * CELLS), array("I", [0] * CELLS)]
+    for info in run_games(games, taking_policy, workers=workers, seed=seed, player_names=PLAYER_NAMES,
+                          override_rules=override_rules):
+        dealt = cardmask.mask_of(info["cards"][PLAYER_NAMES[0]])
+        passed = info["passed_cards"]
+        exchanged = (dealt | cardmask.mask_of(passed["forth"])) & ~cardmask.mask_of(passed["back"])
+        points = info["players_points"][PLAYER_NAMES[0]] + info["players_points"][PLAYER_NAMES[2]]
+        for table, hand in enumerate((dealt, exchanged)):
+            index = hand_index(hand)
+            sums[table][index] += points
+            counts[table][index] += 1
+    rules = json.dumps(MarjaPussi.rules_dict(MarjaPussi.shared_rules(override_rules)), sort_keys=True).encode()
+    rules += b" " * (-len(rules) % 4)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, CELLS, len(rules)))
+        f.write(rules)
+        for table in range(2):
+            means = array("f", [s / c if c else 0.0 for s, c in zip(sums[table], counts[table])])
+            for column in (means, counts[table]):
+                if sys.byteorder == "big":
+                    column.byteswap()
+                column.tofile(f)
+
+if __name__ == "__main__":
+    build_tables(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
@@ -0,0 +1,159 @@
+"""
+Search over whole card exchanges of PASS and PBCK.
+
+The partner of the playing player passes 4 of 9 cards forth, the playing
+player passes 4 of 13 cards back. Instead of choosing one card at a time,
+all 126 or 715 subsets are ranked by the value of the resulting hands:
+completed trump pairs, aces, guarded tens and voids to trump into.
+
+Rankings only depend on the hand and the points of the rules, colors whose
+pairs are worth the same can be swapped without changing them. They are
+memoized by the hand with such colors sorted, see canonical.
+"""
+from functools import lru_cache
+from itertools import product
+
+import marjapussi.cardmask as cardmask
+from marjapussi.cardmask import COLORS
+
+SUIT = (1 << len(cardmask.VALUES)) - 1  # the cards of the first color
+ACE, TEN, KING, QUEEN = (1 << cardmask.VALUE_RANK[val] for val in "AZKO")
+# weights of the hand value on top of the points of the cards
+ACE_TRICK = 10  # an ace usually takes a trick with the points of others
+GUARDED_TEN = 0.8  # share of a ten with its ace that is kept, 0.3 without
+HALF = 0.25  # a half of a pair, the partner may hold the other one
+TRUMP_LENGTH = 4  # every card beyond the pair in a color with a pair
+VOID = 8  # every void color, if there is a pair to trump into it
+KEEP = 0.5  # weight of the hand the partner keeps in PASS
+
+
+def suits(hand) -> list:
+    """The cards of every color of hand as masks of values (bit i is VALUES[i])."""
+    return [hand >> (9 * i) & SUIT for i in range(len(COLORS))]
+
+
+def _points_key(points) -> tuple:
+    return tuple(sorted(points.items()))
+
+
+@lru_cache(maxsize=None)
+def _suit_value(suit, pair, ace, ten) -> float:
+    value = 0.0
+    if suit & ACE:
+        value += ace + ACE_TRICK
+    if suit & TEN:
+        value += ten * (GUARDED_TEN if suit & ACE else 0.3)
+    if suit & KING and suit & QUEEN:
+        value += pair + TRUMP_LENGTH * (cardmask.count(suit) - 2)
+    elif suit & (KING | QUEEN):
+        value += pair * HALF
+    return value
+
+
+def hand_value(hand, points, voids=True) -> float:
+    """Heuristic value of playing hand (a card mask), points are the points of the rules."""
+    ace, ten = points["A"], points["Z"]
+    value, trumps, empty = 0.0, False, 0
+    for col, suit in zip(COLORS, suits(hand)):
+        value += _suit_value(suit, points[col], ace, ten)
+        trumps = trumps or suit & (KING | QUEEN) == KING | QUEEN
+        empty += not suit
+    return value + VOID * empty if voids and trumps else value
+
+
+def canonical(hand, points) -> tuple:
+    """
+    (canonical hand, order) where colors with equally valued pairs are sorted by their cards.
+    Color i of the canonical hand is color order[i] of hand.
+    """
+    hand_suits = suits(hand)
+    order = sorted(range(len(COLORS)), key=lambda i: (points[COLORS[i]], hand_suits[i]), reverse=True)
+    # only swap colors within groups of equal pair points
+    slots = sorted(range(len(COLORS)), key=lambda i: points[COLORS[i]], reverse=True)
+    perm = [0] * len(COLORS)
+    for slot, i in zip(slots, order):
+        perm[slot] = i
+    return permute(hand, perm, inverse=True), tuple(perm)
+
+
+def permute(mask, order, inverse=False) -> int:
+    """Color order[i] of mask becomes color i, or the other way round with inverse."""
+    result = 0
+    for i, j in enumerate(order):
+        src, dst = (j, i) if inverse else (i, j)
+        result |= (mask >> (9 * src) & SUIT) << (9 * dst)
+    return result
+
+
+def _splits(suit, offset, points, col) -> list:
+    """For every number of cards n the ways to pass n cards of one color, see _rank."""
+    pair, ace, ten = points[col], points["A"], points["Z"]
+    splits = [[] for _ in range(5)]
+    sub = suit
+    while True:
+        # all subsets of suit, including 0
+        n = cardmask.count(sub)
+        if n <= 4:
+            keep = suit & ~sub
+            splits[n].append((sub << offset, _suit_value(keep, pair, ace, ten), _suit_value(sub, pair, ace, ten),
+                              not keep, keep & (KING | QUEEN) == KING | QUEEN))
+        if not sub:
+            return splits
+        sub = (sub - 1) & suit
+
+
+@lru_cache(maxsize=4096)
+def _rank(hand, phase, points_key) -> tuple:
+    # hand_value is a sum over the colors, so every color is split into passed and kept cards once
+    points = dict(points_key)
+    parts = [_splits(suit, 9 * i, points, col) for i, (col, suit) in enumerate(zip(COLORS, suits(hand)))]
+    weight = KEEP if phase == "PASS" else 1
+    give_weight = 1 if phase == "PASS" else 0
+    ranked = []
+    for n0 in range(5):
+        for n1 in range(5 - n0):
+            for n2 in range(5 - n0 - n1):
+                for split in product(parts[0][n0], parts[1][n1], parts[2][n2], parts[3][4 - n0 - n1 - n2]):
+                    give = keep = given = 0
+                    empty, trumps = 0, False
+                    for sub, keep_value, give_value, void, pair in split:
+                        give |= sub
+                        keep += keep_value
+                        given += give_value
+                        empty += void
+                        trumps = trumps or pair
+                    if trumps:
+                        keep += VOID * empty
+                    ranked.append((give_weight * given + weight * keep, give))
+    # on ties pass the lower cards
+    ranked.sort(key=lambda item: (-item[0], -item[1]))
+    return tuple(ranked)
+
+
+def rank_exchanges(hand, phase, points, top=None) -> list:
+    """(score, mask of the 4 cards to pass) for every exchange of hand in phase PASS or PBCK, best first."""
+    if phase not in ("PASS", "PBCK"):
+        raise ValueError(f"Can only exchange cards in PASS and PBCK, not in {phase}.")
+    canon, order = canonical(hand, points)
+    ranked = _rank(canon, phase, _points_key(points))
+    return [(score, permute(give, order)) for score, give in ranked[:top]]
+
+
+def best_exchange(game) -> int:
+    """Mask of the best 4 cards for the player at turn to pass, including the ones already passed."""
+    phase = game.phase
+    passed = cardmask.mask_of(game.passed_cards["forth" if phase == "PASS" else "back"])
+    canon, order = canonical(game.player_at_turn.hand, game.rules["points"])
+    canon_passed = permute(passed, order, inverse=True)
+    for _, give in _rank(canon, phase, _points_key(game.rules["points"])):
+        if give & canon_passed == canon_passed:
+            return permute(give, order)
+    raise ValueError("No exchange contains the passed cards.")
+
+
+def exchange_policy(game) -> str:
+    """Next card of best_exchange, only for the phases PASS and PBCK."""
+    phase = game.phase
+    passed = cardmask.mask_of(game.passed_cards["forth" if phase == "PASS" else "back"])
+    card = cardmask.ids_of(best_exchange(game) & ~passed)[0]
+    return f"{game.player_at_turn.number},{phase},{cardmask.CARDS[card]}"
@@ -1,54 +1,100 @@
-from random import shuffle
-import marjapussi.utils as utils
+from random import shuffle, Random
+from time import perf_counter
+from types import MappingProxyType
+import marjapussi.cardmask as cardmask
+import marjapussi.actions as actions
+import marjapussi.record as record
+import marjapussi.zobrist as zobrist
 from marjapussi.player import Player
 
-import logging
-logging.basicConfig(format='%(levelname)s: %(message)s')
+# log levels, same as in logging which is only imported once a game logs, see game_logger
+DEBUG = 10
+INFO = 20
+
+_SHARED_RULES = {}  # repr of rules -> read-only rules shared by all games, see shared_rules
+
+
+def game_logger():
+    """
+    Logger of all games. Imports logging on the first call and adds a handler
+    printing to stderr, unless a handler is configured already.
+    """
+    import logging
+    logger = logging.getLogger("single_game_logger")
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+class _Messages():
+    """MarjaPussi.INFO_MSG, imports marjapussi.messages on the first access."""
+
+    def __get__(self, game, cls=None) -> dict:
+        from marjapussi.messages import INFO_MSG
+        return INFO_MSG
 
 
 class MarjaPussi():
     """Implements a single game of MarjaPussi."""
 
+    __slots__ = ("_logger", "fancy", "language", "rules", "hooks", "players", "seed", "original_hands",
+                 "player_at_turn", "playing_player", "game_value", "no_one_plays", "phase", "passed_cards",
+                 "all_actions", "sup_col", "all_sup", "plays", "trick_ids", "played", "action_space",
+                 "_legal", "_legal_actions", "_history", "metrics", "_start_time", "state_hash")
+
     DEFAULT_RULES = {
         "start_game_value": 115,
         "max_game_value": 420,
         "points": {symb: val for symb, val in zip("rsegAZKOU9876L", [100, 80, 60, 40, 11, 10, 4, 3, 2, 0, 0, 0, 0, 20])},
         "start_phase": "PROV",
     }
+    INFO_MSG = _Messages()  # texts of the log messages by language, see marjapussi.messages
 
-    def __init__(self, player_names, override_rules={}, log=True, fancy=True, language=1) -> None:
-        # init logger
-        self.logger = logging.getLogger("single_game_logger")
+    def __init__(self, player_names, override_rules={}, log=True, fancy=True, language=1, undo=False,
+                 deal=None, seed=None, metrics=None) -> None:
+        # init logger, games with log=False don't log
+        self._logger = None
         if log:
-            self.logger.setLevel(logging.INFO)
-        if log == "DEBUG":
-            self.logger.setLevel(logging.DEBUG)
+            self._logger = game_logger()
+            self._logger.setLevel(DEBUG if log == "DEBUG" else INFO)
         self.fancy = fancy
         self.language = language
         # init rules
-        self.rules = MarjaPussi.DEFAULT_RULES | override_rules
-        self.logger.debug(f"Ruleset: {override_rules}")
+        self.rules = MarjaPussi.shared_rules(override_rules)
+        self.hooks = ()  # subscribers of game events, see subscribe
+        self._event("rules", override_rules)
         # init players and cards
         assert len(player_names) == 4, "There have to be 4 names!"
-        deck = utils.CARDS[:]
-        shuffle(deck)
         self.players = [Player(name, num, self.rules["points"])
                         for num, name in enumerate(player_names)]
-        # only used for logging
-        self.players_dict = {player.number: player for player in self.players}
-        while deck:
-            for p in self.players:
-                p.give_card(deck.pop())
+        self.seed = seed if deal is None else None  # same seed, same cards
+        if deal is None:
+            deck = cardmask.CARDS[:]
+            if seed is None:
+                shuffle(deck)
+            else:
+                Random(seed).shuffle(deck)
+            while deck:
+                for p in self.players:
+                    p.give_card(deck.pop())
+        else:
+            # given cards of every player, 9 each and all of the deck
+            if len(deal) != 4 or any(len(cards) != 9 for cards in deal) \
+                    or sorted(c for cards in deal for c in cards) != sorted(cardmask.CARDS):
+                raise ValueError("Not a valid deal, every player needs 9 cards of the deck.")
+            for p, cards in zip(self.players, deal):
+                p.cards = cards
         for player in self.players:
-            self.logger.debug(
-                f"{player.name}: {utils.cards_str(player.cards, fancy=self.fancy)}")
-        self.logger.info(MarjaPussi.INFO_MSG["got_their_cards"][self.language])
+            self._event("hand", player.number, player.hand)
+        self._event("dealt")
 
         for i in range(4):
             self.players[i].set_partner(self.players[(i+2) % 4])
             self.players[i].set_next_player(self.players[(i+1) % 4])
 
-        self.original_cards = {p.name: p.cards[:] for p in self.players}
+        self.original_hands = tuple(p.hand for p in self.players)
         self.player_at_turn = self.players[0]
         self.playing_player = None
         self.game_value = self.rules["start_game_value"]
@@ -58,43 +104,146 @@ class MarjaPussi():
         self.all_actions = []
         self.sup_col = ""
         self.all_sup = []
-        self.tricks = [[]]
+        self.plays = bytearray()  # card numbers of all played cards in order, see tricks
+        self.trick_ids = []  # card numbers of the current trick
+        self.played = 0  # mask of all played cards
+        self.action_space = actions.action_space(
+            self.rules["start_game_value"], self.rules["max_game_value"])
+        self._legal = None  # mask of legal action ids, cached until next action
+        self._legal_actions = None
+        self._history = [] if undo else None  # state before each action, see undo_action
+        self.metrics = metrics  # see marjapussi.metrics, None costs nothing
+        self._start_time = perf_counter() if metrics is not None else None
+        self.state_hash = zobrist.full_hash(self)  # equal for equal states, see marjapussi.zobrist
+
+    @classmethod
+    def shared_rules(cls, override_rules) -> MappingProxyType:
+        """Read-only DEFAULT_RULES | override_rules, nested dicts included, the same object for equal rules."""
+        rules = cls.rules_dict(cls.DEFAULT_RULES | dict(override_rules))
+        key = repr(rules)
+        shared = _SHARED_RULES.get(key)
+        if shared is None:
+            # rules_dict copied the nested dicts, DEFAULT_RULES can't be changed through them
+            shared = MappingProxyType({name: MappingProxyType(value) if isinstance(value, dict) else value
+                                       for name, value in rules.items()})
+            if len(_SHARED_RULES) < 1024:
+                _SHARED_RULES[key] = shared
+        return shared
+
+    @staticmethod
+    def rules_dict(rules) -> dict:
+        """Copy of rules as plain dicts, e.g. to pickle or serialise game.rules."""
+        return {name: dict(value) if isinstance(value, (dict, MappingProxyType)) else value
+                for name, value in rules.items()}
+
+    @property
+    def logger(self):
+        """Logger of the game, game_logger() for games with log=False as well, which don't log."""
+        return game_logger() if self._logger is None else self._logger
+
+    @logger.setter
+    def logger(self, logger) -> None:
+        self._logger = logger
+
+    @property
+    def tricks(self) -> list:
+        """Cards of all tricks, the last one is the current trick."""
+        plays = self.plays
+        tricks = [[cardmask.CARDS[c] for c in plays[i:i+4]] for i in range(0, len(plays), 4)]
+        if len(plays) % 4 == 0 and len(plays) < len(cardmask.CARDS):
+            tricks.append([])
+        return tricks
+
+    @property
+    def original_cards(self) -> dict:
+        """Cards every player was dealt."""
+        return {p.name: cardmask.cards_of(hand) for p, hand in zip(self.players, self.original_hands)}
 
     def legal_actions(self) -> list:
         """
         phases: PROV, PASS, PBCK, PRMO, FTRI, QUES, ANSW, TRCK, DONE
         action -> <player number>','<phase>','<val | card>
         """
-        legal_in_phase = {
-            "PROV": self.legal_prov,
-            "PASS": self.legal_pass,
-            "PBCK": self.legal_passing_back,
-            "PRMO": self.legal_prmo,
-            "QUES": self.legal_ques,#also includes act_trck
-            "ANSW": self.legal_answer,
-            "TRCK": self.legal_trck,
-            "DONE": lambda: []
-        }[self.phase]
-        return legal_in_phase()
+        if self.metrics is not None:
+            self.metrics.legal_actions_calls += 1
+            self.metrics.legal_actions_cache_hits += self._legal_actions is not None
+        if self._legal_actions is None:
+            self._legal_actions = [self.action_str(i) for i in self.legal_action_ids()]
+        return self._legal_actions[:]
+
+    def legal_action_ids(self) -> list:
+        """Legal actions as ids of self.action_space, see marjapussi.actions."""
+        return cardmask.ids_of(self.legal_mask())
+
+    def legal_mask(self) -> int:
+        """Bitmask of legal action ids, cached until the next action."""
+        if self._legal is None:
+            legal_in_phase = {
+                "PROV": self.legal_prov,
+                "PASS": self.legal_pass,
+                "PBCK": self.legal_passing_back,
+                "PRMO": self.legal_prmo,
+                "QUES": self.legal_ques,#also includes act_trck
+                "ANSW": self.legal_answer,
+                "TRCK": self.legal_trck,
+                "DONE": lambda: 0
+            }[self.phase]
+            self._legal = legal_in_phase()
+        return self._legal
+
+    def action_phase(self, action_id) -> str:
+        # cards can also be played while asking
+        return "TRCK" if self.phase == "QUES" and action_id >= actions.CARD_BASE else self.phase
+
+    def action_str(self, action_id) -> str:
+        """String of action_id for the player at turn."""
+        return self.action_space.strings[self.action_phase(action_id)][self.player_at_turn.number][action_id]
+
+    def is_legal(self, action) -> bool:
+        action_id = self.action_space.ids.get(action)
+        return action_id is not None and bool(self.legal_mask() >> action_id & 1) \
+            and self.action_str(action_id) == action
 
     def act_action(self, action) -> bool:
         """Phases: PROV, PASS, PBCK, PRMO, FTRI, QUES, ANSW, TRCK"""
         # ? there is not a real reason why they are 4 letters long but it looks neat
-        if not action in self.legal_actions():
-            self.logger.warning(
+        if not self.is_legal(action):
+            if self.metrics is not None:
+                self.metrics.illegal_actions += 1
+            game_logger().warning(
                 "Not a legal action! This is not supposed to happen!")
             return False
             #logging.warning("Proceeding anyway for debugging purposes...")
+        # store the shared action string
+        action_id = self.action_space.ids[action]
+        self._act(action_id, self.action_str(action_id))
+        return True
+
+    def act_action_id(self, action_id) -> bool:
+        """Same as act_action, with an id of self.action_space."""
+        if not (0 <= action_id < self.action_space.num_actions and self.legal_mask() >> action_id & 1):
+            if self.metrics is not None:
+                self.metrics.illegal_actions += 1
+            game_logger().warning(
+                "Not a legal action! This is not supposed to happen!")
+            return False
+        self._act(action_id, self.action_str(action_id))
+        return True
 
+    def _act(self, action_id, action):
+        if self.metrics is not None:
+            start = perf_counter()
+        if self._history is not None:
+            self._history.append(self._snapshot())
         self.all_actions.append(action)
+        self._legal = self._legal_actions = None
 
-        action_list = action.split(',')
-        action_list[0] = int(action_list[0])
+        player, phase = self.player_at_turn.number, self.action_phase(action_id)
+        content = self.action_space.contents[action_id]
 
-        self.logger.debug(
-            f"{self.player_at_turn.name}: {utils.cards_str(self.player_at_turn.cards, fancy=self.fancy)}")
-        self.logger.debug(
-            f"Action player={self.players_dict[action_list[0]].name}, phase={action_list[1]}, content={action_list[2]}")
+        self._event("hand", player, self.player_at_turn.hand)
+        self._event("action", player, phase, content)
+        self.state_hash ^= zobrist.TURN[player] ^ zobrist.PHASE[self.phase]
 
         act_in_phase = {
             "PROV": self.act_prov,
@@ -104,26 +253,112 @@ class MarjaPussi():
             "QUES": self.act_ques,
             "ANSW": self.act_answ,
             "TRCK": self.act_trck,
-        }[action_list[1]]
-        act_in_phase(action_list[0], action_list[2])
+        }[phase]
+        act_in_phase(player, content)
+        self.state_hash ^= zobrist.TURN[self.player_at_turn.number] ^ zobrist.PHASE[self.phase]
+        if self.metrics is not None:
+            self.metrics.acted(phase, perf_counter() - start)
+
+    def _snapshot(self) -> tuple:
+        """Everything an action can change, lists only by their length."""
+        return (self.phase, self.player_at_turn.number,
+                None if self.playing_player is None else self.playing_player.number,
+                self.game_value, self.no_one_plays, self.sup_col, len(self.all_sup),
+                len(self.passed_cards["forth"]), len(self.passed_cards["back"]),
+                len(self.plays), self.played, self.state_hash,
+                tuple((p.hand, p.asking, p.still_prov, p.points_made, len(p.tricks), len(p.sup_calls))
+                      for p in self.players))
+
+    def undo_action(self) -> bool:
+        """Reverts the last action, only possible if the game was created with undo=True."""
+        if not self._history:
+            return False
+        (self.phase, turn, playing, self.game_value, self.no_one_plays, self.sup_col, n_sup,
+         n_forth, n_back, n_plays, self.played, self.state_hash, players) = self._history.pop()
+        self.player_at_turn = self.players[turn]
+        self.playing_player = None if playing is None else self.players[playing]
+        del self.all_sup[n_sup:]
+        del self.passed_cards["forth"][n_forth:]
+        del self.passed_cards["back"][n_back:]
+        del self.plays[n_plays:]
+        self.trick_ids = list(self.plays[n_plays - n_plays % 4:])
+        for p, (p.hand, p.asking, p.still_prov, p.points_made, n_taken, n_calls) in zip(self.players, players):
+            p.tricks = p.tricks[:n_taken]
+            p.sup_calls = p.sup_calls[:n_calls]
+        self._legal = self._legal_actions = None
+        self._event("undo", self.all_actions.pop())
         return True
 
+    def clone(self):
+        """
+        Copy of the game for search, much cheaper than copy.deepcopy. Only the mutable
+        state is copied, rules, logger and action space are shared, hooks and metrics are dropped.
+        """
+        game = MarjaPussi.__new__(MarjaPussi)
+        for name in MarjaPussi.__slots__:
+            setattr(game, name, getattr(self, name))
+        game.players = players = [p.clone() for p in self.players]
+        for i in range(4):
+            players[i].set_partner(players[(i+2) % 4])
+            players[i].set_next_player(players[(i+1) % 4])
+        game.player_at_turn = players[self.player_at_turn.number]
+        game.playing_player = None if self.playing_player is None else players[self.playing_player.number]
+        game.passed_cards = {"forth": self.passed_cards["forth"][:], "back": self.passed_cards["back"][:]}
+        game.all_actions = self.all_actions[:]
+        game.all_sup = self.all_sup[:]
+        game.plays = self.plays[:]
+        game.trick_ids = self.trick_ids[:]
+        game.hooks = ()
+        game.metrics = None
+        if self._history is not None:
+            game._history = self._history[:]
+        return game
+
+    def __getstate__(self) -> dict:
+        state = {name: getattr(self, name) for name in MarjaPussi.__slots__}
+        state["rules"] = MarjaPussi.rules_dict(self.rules)  # mappingproxy can't be pickled
+        return state
+
+    def __setstate__(self, state) -> None:
+        state["rules"] = MarjaPussi.shared_rules(state["rules"])
+        for name, value in state.items():
+            setattr(self, name, value)
+        for player in self.players:
+            player.points = self.rules["points"]
+
+    @classmethod
+    def replay(cls, game_record, player_names=("P1", "P2", "P3", "P4"), stop=None, log=False, **kwargs):
+        """
+        Rebuilds a game from a record (see marjapussi.record), after its first stop actions
+        or all of them. Further keyword arguments are passed to MarjaPussi.
+        """
+        deal, seed, action_ids = record.decode(game_record)
+        game = cls(list(player_names), log=log, deal=deal, seed=seed, **kwargs)
+        for action_id in action_ids[:stop]:
+            if not game.act_action_id(action_id):
+                raise ValueError(f"Record contains illegal action {action_id}.")
+        return game
+
+    def set_hands(self, hands) -> None:
+        """Replaces the cards of all players by the masks in hands, e.g. to sample hidden cards."""
+        for p, hand in zip(self.players, hands):
+            p.hand = hand
+        self._legal = self._legal_actions = None
+        self.state_hash = zobrist.full_hash(self)
+
     def legal_prov(self):
-        actions = [f"{self.player_at_turn.number},PROV,{000}"]
-        for poss_val in range(self.game_value+5, self.rules["max_game_value"]+1, 5):
-            actions.append(f"{self.player_at_turn.number},PROV,{poss_val}")
-        return actions
+        return self.action_space.value_mask(self.game_value)
 
     def act_prov(self, player, value):
         value = int(value)
         if value > self.game_value:
+            self.state_hash ^= zobrist.value_key(self.game_value) ^ zobrist.value_key(value)
             self.game_value = value
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['player_says'][self.language]} {value}.")
+            self._event("says", player, value)
         else:
             self.player_at_turn.still_prov = False
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['is_gone'][self.language]}")
+            self.state_hash ^= zobrist.GONE[player]
+            self._event("gone", player)
         players_still_prov = sum(
             [1 for p in self.players if p.still_prov])
         # more than one player or last player still able to provoke
@@ -135,8 +370,7 @@ class MarjaPussi():
             if self.game_value == self.rules["start_game_value"]:
                 # noone took the game
                 self.player_at_turn = self.players[0]
-                self.logger.info(
-                    f"{MarjaPussi.INFO_MSG['noon_plays'][self.language]}. {self.player_at_turn.name} {MarjaPussi.INFO_MSG['plays'][self.language]}")
+                self._event("no_one_plays", self.player_at_turn.number)
                 self.phase = "TRCK"
             else:
                 # last prov player takes the game
@@ -144,210 +378,247 @@ class MarjaPussi():
                 self.player_at_turn = [
                     p for p in self.players if p.still_prov][0]
                 self.playing_player = self.player_at_turn
+                self.state_hash ^= zobrist.PLAYING[self.playing_player.number]
                 self.player_at_turn = self.playing_player.partner
-                self.logger.info(
-                    f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['takes_the_game'][self.language]} {self.game_value}.")
+                self._event("takes_game", self.playing_player.number, self.game_value)
                 self.phase = "PASS"
 
     def legal_pass(self):
-        actions = []
-        for card in self.playing_player.partner.cards:
-            if card in self.passed_cards["forth"]:
-                continue
-            actions.append(f"{self.playing_player.partner.number},PASS,{card}")
-        return actions
+        cards = self.playing_player.partner.hand & ~cardmask.mask_of(self.passed_cards["forth"])
+        return cards << actions.CARD_BASE
 
     def act_pass(self, player, card):
         if len(self.passed_cards["forth"]) < 4:
             self.passed_cards["forth"].append(card)
+            self.state_hash ^= zobrist.PENDING[cardmask.CARD_ID[card]]
         if len(self.passed_cards["forth"]) == 4:
-            self.logger.debug(
-                f"{player} gives {utils.cards_str(self.passed_cards['forth'], fancy=self.fancy)}.")
+            self._event("gives", player, cardmask.mask_of(self.passed_cards["forth"]))
             for c in self.passed_cards["forth"]:
                 self.playing_player.give_card(c)
                 self.playing_player.partner.take_card(c)
+                self._move_card(c, self.playing_player.partner.number, self.playing_player.number)
             self.player_at_turn = self.player_at_turn.partner
             self.phase = "PBCK"
 
     def legal_passing_back(self):
-        actions = []
-        for card in self.playing_player.cards:
-            if card in self.passed_cards["back"]:
-                continue
-            actions.append(f"{self.playing_player.number},PBCK,{card}")
-        return actions
+        cards = self.playing_player.hand & ~cardmask.mask_of(self.passed_cards["back"])
+        return cards << actions.CARD_BASE
 
     def act_pbck(self, player, card):
         if len(self.passed_cards["back"]) < 4:
             self.passed_cards["back"].append(card)
+            self.state_hash ^= zobrist.PENDING[cardmask.CARD_ID[card]]
         if len(self.passed_cards["back"]) == 4:
-            self.logger.debug(
-                f"{player} gives {utils.cards_str(self.passed_cards['back'], fancy=self.fancy)}.")
+            self._event("gives", player, cardmask.mask_of(self.passed_cards["back"]))
             for c in self.passed_cards["back"]:
                 self.playing_player.take_card(c)
                 self.playing_player.partner.give_card(c)
+                self._move_card(c, self.playing_player.number, self.playing_player.partner.number)
             self.player_at_turn = self.playing_player
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['and'][self.language]} {self.player_at_turn.partner.name} {MarjaPussi.INFO_MSG['passed_cards'][self.language]}")
+            self._event("passed", self.playing_player.number)
             self.phase = "PRMO"
 
+    def _move_card(self, card, giver, taker) -> None:
+        """Updates state_hash for a passed card."""
+        card = cardmask.CARD_ID[card]
+        self.state_hash ^= zobrist.PENDING[card] ^ zobrist.CARD[card][giver] ^ zobrist.CARD[card][taker]
+
     def legal_prmo(self):
-        actions = [f"{self.player_at_turn.number},PRMO,{000}"]
-        for poss_val in range(self.game_value+5, self.rules["max_game_value"]+1, 5):
-            actions.append(f"{self.player_at_turn.number},PRMO,{poss_val}")
-        return actions
+        return self.action_space.value_mask(self.game_value)
 
     def act_prmo(self, player, value):
         value = int(value)
         if value > self.game_value:
+            self.state_hash ^= zobrist.value_key(self.game_value) ^ zobrist.value_key(value)
             self.game_value = value
-            self.logger.info(
-                f"{self.playing_player.name} {MarjaPussi.INFO_MSG['raises_to'][self.language]} {value}.")
+            self._event("raises", player, value)
         else:
-            self.logger.info(
-                f"{self.playing_player.name} {MarjaPussi.INFO_MSG['plays_for'][self.language]} {self.game_value}.")
+            self._event("plays_for", player, self.game_value)
         self.phase = "TRCK"
 
     def legal_trck(self):
-        return [f"{self.player_at_turn.number},TRCK,{c}" for c in
-                utils.allowed_general(self.tricks[-1], self.player_at_turn.cards,
-                                      sup_col=self.sup_col, first=(len(self.tricks[0]) != 4))]
+        allowed = cardmask.allowed_mask(self.trick_ids, self.player_at_turn.hand,
+                                        sup_col=self.sup_col, first=len(self.plays) < 4)
+        return allowed << actions.CARD_BASE
 
     def act_trck(self, player, card):
-        self.logger.info(
-            f"{self.players_dict[player].name} {MarjaPussi.INFO_MSG['plays'][self.language]} {utils.card_str(card, fancy=self.fancy)}.")
+        self._event("plays", player, card)
         self.phase = 'TRCK'
         self.player_at_turn.take_card(card)
+        self.played |= cardmask.CARD_BIT[card]
+        card_id = cardmask.CARD_ID[card]
+        self.state_hash ^= zobrist.CARD[card_id][player] ^ zobrist.CARD[card_id][4 + len(self.trick_ids)]
         # first not over
-        self.tricks[-1].append(card)
+        self.plays.append(card_id)
+        self.trick_ids.append(card_id)
         self.player_at_turn = self.player_at_turn.next_player
         # trick over
-        if len(self.tricks[-1]) == 4:
-            for c in self.tricks[-1]:
-                if c == utils.high_card(self.tricks[-1], sup_col=self.sup_col):
-                    break
-                self.player_at_turn = self.player_at_turn.next_player
-            self.logger.info(
-                f"{MarjaPussi.INFO_MSG['trick'][self.language]} {len(self.tricks)}: {utils.cards_str(self.tricks[-1],fancy=self.fancy)} {MarjaPussi.INFO_MSG['goes_to'][self.language]} {self.player_at_turn.name}.")
-            self.player_at_turn.take_trick(
-                self.tricks[-1], last=len(self.tricks) == len(utils.CARDS)/4)
+        if len(self.trick_ids) == 4:
+            if self.metrics is not None:
+                start = perf_counter()
+            last = len(self.plays) == len(cardmask.CARDS)
+            trick = [cardmask.CARDS[c] for c in self.trick_ids]
+            # player at turn has led the trick
+            _, win = cardmask.trick_winner(self.trick_ids, sup_col=self.sup_col)
+            self.player_at_turn = self.players[(self.player_at_turn.number + win) % 4]
+            self._event("trick", len(self.plays) // 4, trick, self.player_at_turn.number)
+            winner, points = self.player_at_turn.number, self.player_at_turn.points_made
+            self.player_at_turn.take_trick(trick, last=last)
+            self.state_hash ^= zobrist.points_key(winner, points) ^ \
+                zobrist.points_key(winner, self.player_at_turn.points_made)
+            for i, c in enumerate(self.trick_ids):
+                self.state_hash ^= zobrist.CARD[c][4 + i] ^ zobrist.CARD[c][zobrist.PLAYED]
+            if self.metrics is not None:
+                self.metrics.trick_seconds.observe(perf_counter() - start)
             self.phase = "QUES"
-            if len(self.tricks) == len(utils.CARDS)/4:
+            if last:
                 self.phase = "DONE"
+                if self.metrics is not None:
+                    self.metrics.game_seconds.observe(perf_counter() - self._start_time)
                 self.eval_game()
             else:
-                self.tricks.append([])
+                self.trick_ids = []
 
     def legal_ques(self):
         """my->my,yo->yours,ou->ours"""
         lvl = self.player_at_turn.asking
-        quests = []
+        quests = 0
         if lvl == 0:
-            quests += [f"{self.player_at_turn.number},QUES,my{col}" for col in utils.COLORS
-                       if (utils.contains_pair(self.player_at_turn.cards, col) and col not in self.all_sup)]
+            for col in cardmask.COLORS:
+                if cardmask.has_pair(self.player_at_turn.hand, col) and col not in self.all_sup:
+                    quests |= 1 << actions.PAIR_CALL[col]
         if lvl <= 1:
-            quests += [f"{self.player_at_turn.number},QUES,you"]
+            quests |= 1 << actions.CALL_ID["you"]
         if lvl <= 2:
-            quests += [f"{self.player_at_turn.number},QUES,ou{col}" for col in utils.COLORS]
-        return quests+self.legal_trck()
+            quests |= actions.HALF_ACTIONS
+        return quests | self.legal_trck()
 
     def act_ques(self, player, ques):
         if ques[:2] == "my":
-            self.sup_col = col = ques[2]
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['has'][self.language]} {utils.color_str(col,fancy=self.fancy)} {MarjaPussi.INFO_MSG['pair'][self.language]}")
-            self.logger.info(
-                f"{col.capitalize()} {MarjaPussi.INFO_MSG['is_sup'][self.language]}")
-            self.player_at_turn.call_sup(col)
-            self.all_sup.append(col)
+            col = ques[2]
+            self._set_sup(col)
+            self._event("has_pair", player, col)
+            self._event("sup", col)
+            self._call_sup(self.player_at_turn, col)
+            self._add_sup(col)
             self.phase = "TRCK"
         if ques == "you":
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['asks_for'][self.language]} {MarjaPussi.INFO_MSG['pair'][self.language]}")
-            self.player_at_turn.asking = 1
+            self._event("asks_pair", player)
+            self._ask(ques, 1)
             self.player_at_turn = self.player_at_turn.partner
             self.phase = "ANSW"
         if ques[:2] == "ou":
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['asks_for'][self.language]} {utils.color_str(ques[-1], fancy=self.fancy)} {MarjaPussi.INFO_MSG['half'][self.language]}")
-            self.player_at_turn.asking = 2
+            self._event("asks_half", player, ques[-1])
+            self._ask(ques, 2)
             self.player_at_turn = self.player_at_turn.partner
             self.phase = "ANSW"
 
+    def _ask(self, ques, level) -> None:
+        player = self.player_at_turn
+        self.state_hash ^= zobrist.QUESTION[ques] ^ zobrist.ASKING[player.number][player.asking] ^ \
+            zobrist.ASKING[player.number][level]
+        player.asking = level
+
     def legal_answer(self):
         quest = self.all_actions[-1][-3:]
         if quest == "you":
-            answ = [f"{self.player_at_turn.number},ANSW,my{col}" for col in utils.COLORS
-                    if (utils.contains_pair(self.player_at_turn.cards, col) and not col in self.all_sup)]
-            if not answ:
-                return [f"{self.player_at_turn.number},ANSW,nmy"]
-            return answ
+            answ = 0
+            for col in cardmask.COLORS:
+                if cardmask.has_pair(self.player_at_turn.hand, col) and not col in self.all_sup:
+                    answ |= 1 << actions.PAIR_CALL[col]
+            return answ or 1 << actions.CALL_ID["nmy"]
         else:
             col = quest[-1]
-            return [f"{self.player_at_turn.number},ANSW,{(f'ou{col}') if utils.contains_half(self.player_at_turn.cards,col) else f'no{col}'}"]
+            if cardmask.has_half(self.player_at_turn.hand, col):
+                return 1 << actions.HALF_CALL[col]
+            return 1 << actions.NO_HALF_CALL[col]
 
     def act_answ(self, player, answ):
         old_sup = self.sup_col
+        self.state_hash ^= zobrist.QUESTION[self.all_actions[-2][-3:]]
         # partner has no pair
         if answ == "nmy":
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['no_pair'][self.language]}")
+            self._event("no_pair", player)
         # partner has a pair
         if answ[:2] == "my":
-            self.sup_col = answ[-1]
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['has'][self.language]} {utils.color_str(self.sup_col, fancy=self.fancy)} {MarjaPussi.INFO_MSG['pair'][self.language]}")
-            self.player_at_turn.call_sup(self.sup_col)
-            self.all_sup.append(self.sup_col)
+            self._set_sup(answ[-1])
+            self._event("has_pair", player, self.sup_col)
+            self._call_sup(self.player_at_turn, self.sup_col)
+            self._add_sup(self.sup_col)
         # partner has a half
         if answ[:2] == "ou":
             pot_sup = answ[-1]
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['has'][self.language]} {utils.color_str(pot_sup, fancy=self.fancy)} {MarjaPussi.INFO_MSG['half'][self.language]}")
-            if utils.contains_half(self.player_at_turn.partner.cards, pot_sup):
-                self.sup_col = pot_sup
-                self.player_at_turn.call_sup(pot_sup)
-                self.logger.info(
-                    f"{self.player_at_turn.partner.name} {MarjaPussi.INFO_MSG['has_also'][self.language]} {utils.color_str(pot_sup, fancy=self.fancy)} {MarjaPussi.INFO_MSG['half'][self.language]} ")
+            self._event("has_half", player, pot_sup)
+            if cardmask.has_half(self.player_at_turn.partner.hand, pot_sup):
+                self._set_sup(pot_sup)
+                self._call_sup(self.player_at_turn, pot_sup)
+                self._event("has_half_also", self.player_at_turn.partner.number, pot_sup)
         # partner doesn't have a half
         if answ[:2] == "no":
-            self.logger.info(
-                f"{self.player_at_turn.name} {MarjaPussi.INFO_MSG['doesnt_have'][self.language]} {utils.color_str(answ[-1], fancy=self.fancy)} {MarjaPussi.INFO_MSG['half'][self.language]}")
+            self._event("no_half", player, answ[-1])
         # check if new color is sup
         if self.sup_col != old_sup:
-            self.all_sup.append(self.sup_col)
-            self.logger.info(
-                f"{utils.color_str(self.sup_col, fancy=self.fancy).capitalize()} {MarjaPussi.INFO_MSG['is_sup'][self.language]}")
+            self._add_sup(self.sup_col)
+            self._event("sup", self.sup_col)
         self.player_at_turn = self.player_at_turn.partner
         self.phase = "TRCK"
 
+    def _set_sup(self, col) -> None:
+        self.state_hash ^= zobrist.SUP[self.sup_col] ^ zobrist.SUP[col]
+        self.sup_col = col
+
+    def _add_sup(self, col) -> None:
+        if col not in self.all_sup:
+            self.state_hash ^= zobrist.ALL_SUP[col]
+        self.all_sup.append(col)
+
+    def _call_sup(self, player, col) -> None:
+        """player.call_sup with state_hash updated."""
+        number, points, calls = player.number, player.points_made, player.sup_calls
+        player.call_sup(col)
+        if player.sup_calls is not calls:
+            self.state_hash ^= zobrist.SUP_CALL[number][col] ^ zobrist.points_key(number, points) ^ \
+                zobrist.points_key(number, player.points_made)
+
     def eval_game(self):
-        self.logger.info(MarjaPussi.INFO_MSG["game_done"][self.language])
+        self._event("game_done")
         if self.no_one_plays:
             return
         playing, partner = self.playing_player, self.playing_player.partner
-        self.logger.info(
-            f"{playing.name} {MarjaPussi.INFO_MSG['and'][self.language]} {partner.name}: {playing.points_made}+{partner.points_made}={(pl:=playing.points_made+partner.points_made)}")
+        self._event("party_points", playing.number, playing.points_made, partner.points_made)
         notplay, noplaypart = self.playing_player.next_player, self.playing_player.next_player.partner
-        self.logger.info(
-            f"{notplay.name} {MarjaPussi.INFO_MSG['and'][self.language]} {noplaypart.name}: {notplay.points_made}+{noplaypart.points_made}={(npl:=notplay.points_made+noplaypart.points_made)}")
-
-        if not self.no_one_plays:
-            self.logger.info(
-                f"{MarjaPussi.INFO_MSG['playing_party'][self.language]}: {pl}/{self.game_value}")
-            if pl >= self.game_value:
-                self.logger.info(utils.bold_str(
-                    MarjaPussi.INFO_MSG['win'][self.language], fancy=self.fancy))
-            else:
-                self.logger.info(utils.bold_str(
-                    MarjaPussi.INFO_MSG['loose'][self.language], fancy=self.fancy))
-        else:
-            self.logger.info("There are only loosers this round.")
+        self._event("party_points", notplay.number, notplay.points_made, noplaypart.points_made)
+        pl = playing.points_made + partner.points_made
+        self._event("result", pl, self.game_value)
+        self._event("won" if pl >= self.game_value else "lost")
+
+    def subscribe(self, hook) -> None:
+        """
+        hook is called with a tuple (event, *args) for every event of the game,
+        see MarjaPussi.EVENTS. Players are numbers, cards are strings or masks.
+        """
+        self.hooks += (hook,)
+
+    def unsubscribe(self, hook) -> None:
+        hooks = list(self.hooks)
+        hooks.remove(hook)
+        self.hooks = tuple(hooks)
+
+    def _event(self, *event) -> None:
+        """Passes event to all hooks, the log message is only built if the level is enabled."""
+        for hook in self.hooks:
+            hook(event)
+        if self._logger is not None:
+            level = MarjaPussi.EVENTS[event[0]]
+            if self._logger.isEnabledFor(level):
+                from marjapussi.messages import message
+                self._logger.log(level, message(self, event))
 
     def players_cards(self):
         return {player.name: player.cards for player in self.players}
 
     def state_dict(self):
+        tricks = self.tricks
         return {
             "players_names": [player.name for player in self.players],
             "players_cards": {player.name: player.cards for player in self.players},
@@ -355,8 +626,8 @@ class MarjaPussi():
             "sup_color": self.sup_col,
             "player_at_turn": self.player_at_turn.name,
             "game_phase": self.phase,
-            "trick_num": len(self.tricks),
-            "current_trick": self.tricks[-1],
+            "trick_num": len(tricks),
+            "current_trick": tricks[-1],
             "legal_actions": self.legal_actions(),
             "points_playing_party": None if self.playing_player == None else self.playing_player.points_made + self.playing_player.partner.points_made,
             "points_not_playing_party": None if self.playing_player == None else self.playing_player.next_player.points_made + self.playing_player.next_player.partner.points_made,
@@ -375,36 +646,39 @@ class MarjaPussi():
             "playing_player": self.playing_player.name if not self.no_one_plays else None,
             "game_value": self.game_value,
             "players_points": {p.name: p.points_made for p in self.players},
-            "players_sup": {p.name: p.sup_calls for p in self.players},
+            "players_sup": {p.name: list(p.sup_calls) for p in self.players},
             "schwarz_game": (len(self.players[0].tricks)+len(self.players[2].tricks) == 9 
                                 or len(self.players[1].tricks)+len(self.players[3].tricks) == 9),
         }
 
-    INFO_MSG = {
-        "got_their_cards": ["All players got their cards.", "Alle Spieler erhalten ihre Karten."],
-        "player_says": ["says", "sagt"],
-        "is_gone": ["is gone.", "ist weg."],
-        "noon_plays": ["No one takes the game.", "Niemand spielt das Spiel."],
-        "starts": ["starts.", "beginnt."],
-        "takes_the_game": ["takes the game for", "nimmt das Spiel für"],
-        "and": ["and", "und"],
-        "passed_cards": ["passed cards.", "haben geschoben."],
-        "raises_to": ["raises to", "erhöht auf"],
-        "plays_for": ["plays for", "spielt für"],
-        "plays": ["plays", "legt"],
-        "trick": ["Trick", "Stich"],
-        "goes_to": ["goes to", "geht an"],
-        "has": ["has", "hat"],
-        "is_sup": ["is now superior.", "ist jetzt Trumpf"],
-        "asks_for": ["asks for", "fragt nach"],
-        "pair": ["pair.", "Paar."],
-        "half": ["half.", "Hälfte."],
-        "no_pair": ["doesn't have a pair.", "hat kein Paar."],
-        "has_also": ["also has", "hat auch"],
-        "doesnt_have": ["doesn't have", "hat keine"],
-        "game_done": ["Game is finished.", "Spiel vorbei."],
-        "win": ["Playing party WINS.", "Spielende Partei hat gewonnen!"],
-        "loose": [f"Playing party WINS.", "Spielende Partei hat verloren."],
-        "noonewins": ["No one played, no one wins...", "Niemand hat gespielt, Niemand gewinnt..."],
-        "playing_party": ["Playing Party", "Spielende Partei"]
+    # event -> log level, messages are only built (see marjapussi.messages) for enabled levels
+    EVENTS = {
+        "rules": DEBUG,
+        "hand": DEBUG,
+        "dealt": INFO,
+        "action": DEBUG,
+        "says": INFO,
+        "gone": INFO,
+        "no_one_plays": INFO,
+        "takes_game": INFO,
+        "gives": DEBUG,
+        "passed": INFO,
+        "raises": INFO,
+        "plays_for": INFO,
+        "plays": INFO,
+        "trick": INFO,
+        "has_pair": INFO,
+        "sup": INFO,
+        "asks_pair": INFO,
+        "asks_half": INFO,
+        "no_pair": INFO,
+        "has_half": INFO,
+        "has_half_also": INFO,
+        "no_half": INFO,
+        "game_done": INFO,
+        "party_points": INFO,
+        "result": INFO,
+        "undo": DEBUG,
+        "won": INFO,
+        "lost": INFO,
     }
@@ -0,0 +1,96 @@
+"""
+Log messages of game events, in English (language=0) and German (language=1).
+
+Only imported by MarjaPussi once a message is actually logged.
+"""
+import marjapussi.cardmask as cardmask
+import marjapussi.utils as utils
+
+INFO_MSG = {
+    "got_their_cards": ["All players got their cards.", "Alle Spieler erhalten ihre Karten."],
+    "player_says": ["says", "sagt"],
+    "is_gone": ["is gone.", "ist weg."],
+    "noon_plays": ["No one takes the game.", "Niemand spielt das Spiel."],
+    "starts": ["starts.", "beginnt."],
+    "takes_the_game": ["takes the game for", "nimmt das Spiel für"],
+    "and": ["and", "und"],
+    "passed_cards": ["passed cards.", "haben geschoben."],
+    "raises_to": ["raises to", "erhöht auf"],
+    "plays_for": ["plays for", "spielt für"],
+    "plays": ["plays", "legt"],
+    "trick": ["Trick", "Stich"],
+    "goes_to": ["goes to", "geht an"],
+    "has": ["has", "hat"],
+    "is_sup": ["is now superior.", "ist jetzt Trumpf"],
+    "asks_for": ["asks for", "fragt nach"],
+    "pair": ["pair.", "Paar."],
+    "half": ["half.", "Hälfte."],
+    "no_pair": ["doesn't have a pair.", "hat kein Paar."],
+    "has_also": ["also has", "hat auch"],
+    "doesnt_have": ["doesn't have", "hat keine"],
+    "game_done": ["Game is finished.", "Spiel vorbei."],
+    "win": ["Playing party WINS.", "Spielende Partei hat gewonnen!"],
+    "loose": [f"Playing party WINS.", "Spielende Partei hat verloren."],
+    "noonewins": ["No one played, no one wins...", "Niemand hat gespielt, Niemand gewinnt..."],
+    "playing_party": ["Playing Party", "Spielende Partei"]
+}
+
+
+def _msg(g, key) -> str:
+    return INFO_MSG[key][g.language]
+
+
+def _name(g, player) -> str:
+    return g.players[player].name
+
+
+# event -> message, see MarjaPussi.EVENTS for the log levels
+MESSAGES = {
+    "rules": lambda g, rules: f"Ruleset: {rules}",
+    "hand": lambda g, p, hand:
+        f"{_name(g, p)}: {utils.cards_str(cardmask.cards_of(hand), fancy=g.fancy)}",
+    "dealt": lambda g: _msg(g, "got_their_cards"),
+    "action": lambda g, p, phase, content:
+        f"Action player={_name(g, p)}, phase={phase}, content={content}",
+    "says": lambda g, p, value: f"{_name(g, p)} {_msg(g, 'player_says')} {value}.",
+    "gone": lambda g, p: f"{_name(g, p)} {_msg(g, 'is_gone')}",
+    "no_one_plays": lambda g, p: f"{_msg(g, 'noon_plays')}. {_name(g, p)} {_msg(g, 'plays')}",
+    "takes_game": lambda g, p, value:
+        f"{_name(g, p)} {_msg(g, 'takes_the_game')} {value}.",
+    "gives": lambda g, p, cards:
+        f"{_name(g, p)} gives {utils.cards_str(cardmask.cards_of(cards), fancy=g.fancy)}.",
+    "passed": lambda g, p:
+        f"{_name(g, p)} {_msg(g, 'and')} {_name(g, (p+2) % 4)} {_msg(g, 'passed_cards')}",
+    "raises": lambda g, p, value: f"{_name(g, p)} {_msg(g, 'raises_to')} {value}.",
+    "plays_for": lambda g, p, value: f"{_name(g, p)} {_msg(g, 'plays_for')} {value}.",
+    "plays": lambda g, p, card:
+        f"{_name(g, p)} {_msg(g, 'plays')} {utils.card_str(card, fancy=g.fancy)}.",
+    "trick": lambda g, num, trick, p:
+        f"{_msg(g, 'trick')} {num}: {utils.cards_str(trick, fancy=g.fancy)} {_msg(g, 'goes_to')} {_name(g, p)}.",
+    "has_pair": lambda g, p, col:
+        f"{_name(g, p)} {_msg(g, 'has')} {utils.color_str(col, fancy=g.fancy)} {_msg(g, 'pair')}",
+    "sup": lambda g, col:
+        f"{utils.color_str(col, fancy=g.fancy).capitalize()} {_msg(g, 'is_sup')}",
+    "asks_pair": lambda g, p: f"{_name(g, p)} {_msg(g, 'asks_for')} {_msg(g, 'pair')}",
+    "asks_half": lambda g, p, col:
+        f"{_name(g, p)} {_msg(g, 'asks_for')} {utils.color_str(col, fancy=g.fancy)} {_msg(g, 'half')}",
+    "no_pair": lambda g, p: f"{_name(g, p)} {_msg(g, 'no_pair')}",
+    "has_half": lambda g, p, col:
+        f"{_name(g, p)} {_msg(g, 'has')} {utils.color_str(col, fancy=g.fancy)} {_msg(g, 'half')}",
+    "has_half_also": lambda g, p, col:
+        f"{_name(g, p)} {_msg(g, 'has_also')} {utils.color_str(col, fancy=g.fancy)} {_msg(g, 'half')}",
+    "no_half": lambda g, p, col:
+        f"{_name(g, p)} {_msg(g, 'doesnt_have')} {utils.color_str(col, fancy=g.fancy)} {_msg(g, 'half')}",
+    "game_done": lambda g: _msg(g, "game_done"),
+    "party_points": lambda g, p, points, partner_points:
+        f"{_name(g, p)} {_msg(g, 'and')} {_name(g, (p+2) % 4)}: {points}+{partner_points}={points+partner_points}",
+    "result": lambda g, points, game_value: f"{_msg(g, 'playing_party')}: {points}/{game_value}",
+    "undo": lambda g, action: f"Undo {action}",
+    "won": lambda g: utils.bold_str(_msg(g, "win"), fancy=g.fancy),
+    "lost": lambda g: utils.bold_str(_msg(g, "loose"), fancy=g.fancy),
+}
+
+
+def message(game, event) -> str:
+    """Log message of event, a tuple (name, *args) as passed to hooks."""
+    return MESSAGES[event[0]](game, *event[1:])
@@ -0,0 +1,95 @@
+"""
+Opt-in instrumentation of the engine.
+
+Pass a Metrics to MarjaPussi(metrics=...), one Metrics can be shared by many
+games. Without metrics the engine only checks for None. Times are in seconds.
+"""
+from bisect import bisect_left
+
+from marjapussi.actions import ACTING_PHASES
+
+ACTION_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1)
+GAME_BUCKETS = (1e-3, 1e-2, 0.1, 1, 10, 60, 300, 1800)
+
+
+class Histogram():
+    """Counts of observations per bucket, bucket i counts values <= buckets[i] and > buckets[i-1]."""
+
+    def __init__(self, buckets=ACTION_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> list:
+        """(upper bound, count of values <= bound) for all buckets, last bound is inf."""
+        result, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "buckets": self.cumulative()}
+
+
+class Metrics():
+    """Counters and timing histograms of the games it is passed to."""
+
+    def __init__(self) -> None:
+        self.actions = {phase: 0 for phase in ACTING_PHASES}
+        self.action_seconds = {phase: Histogram() for phase in ACTING_PHASES}
+        self.legal_actions_calls = 0
+        self.legal_actions_cache_hits = 0
+        self.illegal_actions = 0
+        self.trick_seconds = Histogram()
+        self.game_seconds = Histogram(GAME_BUCKETS)
+
+    def acted(self, phase, seconds) -> None:
+        self.actions[phase] += 1
+        self.action_seconds[phase].observe(seconds)
+
+    def as_dict(self) -> dict:
+        return {
+            "actions": dict(self.actions),
+            "action_seconds": {phase: h.as_dict() for phase, h in self.action_seconds.items()},
+            "legal_actions_calls": self.legal_actions_calls,
+            "legal_actions_cache_hits": self.legal_actions_cache_hits,
+            "illegal_actions": self.illegal_actions,
+            "trick_seconds": self.trick_seconds.as_dict(),
+            "game_seconds": self.game_seconds.as_dict(),
+        }
+
+    def prometheus(self, prefix="marjapussi") -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def counter(name, value, labels=""):
+            lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def histogram(name, hist, labels=""):
+            inner = labels[1:-1] + "," if labels else ""
+            for bound, count in hist.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_{name}_bucket{{{inner}le="{le}"}} {count}')
+            lines.append(f"{prefix}_{name}_sum{labels} {hist.sum}")
+            lines.append(f"{prefix}_{name}_count{labels} {hist.count}")
+
+        lines.append(f"# TYPE {prefix}_actions_total counter")
+        for phase, count in self.actions.items():
+            counter("actions_total", count, f'{{phase="{phase}"}}')
+        lines.append(f"# TYPE {prefix}_action_seconds histogram")
+        for phase, hist in self.action_seconds.items():
+            histogram("action_seconds", hist, f'{{phase="{phase}"}}')
+        for name in ("legal_actions_calls", "legal_actions_cache_hits", "illegal_actions"):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            counter(f"{name}_total", getattr(self, name))
+        for name in ("trick_seconds", "game_seconds"):
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            histogram(name, getattr(self, name))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,173 @@
+"""
+Fixed size observation of a game from the view of one seat.
+
+ObservationEncoder subscribes to the events of a game and updates a float32
+array in place, observation returns a read-only view of it. Seats are
+relative to the observing seat (0 is the seat itself, 1 the next player),
+cards are numbered like in marjapussi.cardmask. Needs numpy.
+"""
+import numpy as np
+
+import marjapussi.cardmask as cardmask
+from marjapussi.actions import PHASES
+from marjapussi.cardmask import COLORS, CARDS
+
+NUM_CARDS = len(CARDS)
+FEATURES = [
+    ("hand", NUM_CARDS),
+    ("played", 4 * NUM_CARDS),  # all cards played by every seat
+    ("trick", 4 * NUM_CARDS),  # cards of every seat in the current trick
+    ("forth", NUM_CARDS),  # passed cards, only known to the playing party
+    ("back", NUM_CARDS),
+    ("voids", 4 * len(COLORS)),  # colors a seat failed to follow
+    ("game_value", 1),  # divided by the max game value
+    ("sup", len(COLORS)),
+    ("all_sup", len(COLORS)),
+    ("asking", 4 * 3),  # asking level of every seat
+    ("phase", len(PHASES)),
+    ("turn", 4),
+    ("playing", 4),
+]
+SLICES = {}
+_start = 0
+for _name, _size in FEATURES:
+    SLICES[_name] = slice(_start, _start + _size)
+    _start += _size
+OBSERVATION_SIZE = _start
+
+PHASE_ID = {phase: i for i, phase in enumerate(PHASES)}
+COLOR_ID = {col: i for i, col in enumerate(COLORS)}
+# bits of every byte, to unpack card masks
+BYTE_BITS = ((np.arange(256)[:, None] >> np.arange(8)) & 1).astype(np.float32)
+
+
+def cards_array(mask) -> np.ndarray:
+    """Card mask as NUM_CARDS floats."""
+    return BYTE_BITS[np.frombuffer(mask.to_bytes(5, "little"), dtype=np.uint8)].ravel()[:NUM_CARDS]
+
+
+class ObservationEncoder():
+    """
+    Observation of game for seat, kept up to date by game events. out is an optional
+    float32 array of OBSERVATION_SIZE to write into, e.g. a row of a batch.
+    """
+
+    def __init__(self, game, seat: int, out=None) -> None:
+        self.game = game
+        self.seat = seat
+        self.data = np.zeros(OBSERVATION_SIZE, dtype=np.float32) if out is None else out
+        if self.data.shape != (OBSERVATION_SIZE,) or self.data.dtype != np.float32:
+            raise ValueError(f"out has to be a float32 array of shape ({OBSERVATION_SIZE},).")
+        self.view = self.data.view()
+        self.view.flags.writeable = False
+        self.sections = {name: self.data[s] for name, s in SLICES.items()}
+        for name in ("played", "trick", "voids", "asking"):
+            self.sections[name] = self.sections[name].reshape(4, -1)
+        self.handlers = {
+            "plays": self._plays,
+            "trick": self._trick,
+            "gives": self._gives,
+            "says": self._value,
+            "raises": self._value,
+            "takes_game": self._takes_game,
+            "sup": self._sup,
+            "asks_pair": self._asks,
+            "asks_half": self._asks,
+            "undo": lambda action: self.rebuild(),
+        }
+        self.rebuild()
+        game.subscribe(self)
+
+    def __call__(self, event) -> None:
+        handler = self.handlers.get(event[0])
+        if handler is not None:
+            handler(*event[1:])
+
+    def close(self) -> None:
+        """Stops following the game."""
+        self.game.unsubscribe(self)
+
+    @property
+    def observation(self) -> np.ndarray:
+        """Read-only view of the observation, changes with the game."""
+        # phase and turn change at the end of an action, there is no event for them
+        data = self.data
+        data[self.phase_index] = data[self.turn_index] = 0
+        self.phase_index = SLICES["phase"].start + PHASE_ID[self.game.phase]
+        self.turn_index = SLICES["turn"].start + self._rel(self.game.player_at_turn.number)
+        data[self.phase_index] = data[self.turn_index] = 1
+        return self.view
+
+    def rebuild(self) -> None:
+        """Encodes the whole state of the game, e.g. after undoing an action."""
+        game, sections = self.game, self.sections
+        self.data[:] = 0
+        self.phase_index, self.turn_index = SLICES["phase"].start, SLICES["turn"].start
+        sections["hand"][:] = cards_array(game.players[self.seat].hand)
+        self.lead = None
+        in_trick = 0
+        for action in game.all_actions:
+            player, phase, content = action.split(",")
+            if phase == "TRCK":
+                self._plays(int(player), content)
+                in_trick = (in_trick + 1) % 4
+                if in_trick == 0:
+                    self._trick()
+        if game.playing_player is not None:
+            self._takes_game(game.playing_player.number, game.game_value)
+            for direction in ("forth", "back"):
+                cards = game.passed_cards[direction]
+                if len(cards) == 4 and self.seat % 2 == game.playing_player.number % 2:
+                    sections[direction][:] = cards_array(cardmask.mask_of(cards))
+        self._value(None, game.game_value)
+        for col in game.all_sup:
+            self._sup(col)
+        if game.sup_col:
+            self._sup(game.sup_col)
+        for p in game.players:
+            sections["asking"][self._rel(p.number), p.asking] = 1
+
+    def _rel(self, player) -> int:
+        return (player - self.seat) % 4
+
+    def _plays(self, player, card) -> None:
+        card_id, rel, sections = cardmask.CARD_ID[card], self._rel(player), self.sections
+        if self.lead is None:
+            self.lead = cardmask.COLOR_OF[card_id]
+        elif cardmask.COLOR_OF[card_id] != self.lead:
+            sections["voids"][rel, COLOR_ID[self.lead]] = 1
+        sections["played"][rel, card_id] = 1
+        sections["trick"][rel, card_id] = 1
+        if player == self.seat:
+            sections["hand"][card_id] = 0
+
+    def _trick(self, *args) -> None:
+        self.sections["trick"][:] = 0
+        self.lead = None
+
+    def _gives(self, player, mask) -> None:
+        game = self.game
+        forth = len(game.passed_cards["back"]) < 4
+        if self.seat % 2 == player % 2:
+            self.sections["forth" if forth else "back"][:] = cards_array(mask)
+        if self.seat == player:
+            self.sections["hand"][:] -= cards_array(mask)
+        elif self.seat == (player + 2) % 4:
+            self.sections["hand"][:] += cards_array(mask)
+
+    def _value(self, player, value) -> None:
+        self.sections["game_value"][0] = value / self.game.rules["max_game_value"]
+
+    def _takes_game(self, player, value) -> None:
+        self.sections["playing"][:] = 0
+        self.sections["playing"][self._rel(player)] = 1
+
+    def _sup(self, col) -> None:
+        self.sections["sup"][:] = 0
+        self.sections["sup"][COLOR_ID[col]] = 1
+        self.sections["all_sup"][COLOR_ID[col]] = 1
+
+    def _asks(self, player, *args) -> None:
+        level = 1 if not args else 2
+        self.sections["asking"][self._rel(player)] = 0
+        self.sections["asking"][self._rel(player), level] = 1
@@ -1,9 +1,12 @@
-import marjapussi.utils as utils
+import marjapussi.cardmask as cardmask
 
 
 class Player():
     """Implements a player of the MarjaPussi game."""
 
+    __slots__ = ("name", "number", "points", "partner", "next_player", "asking", "hand", "still_prov",
+                 "prov_val", "tricks", "sup_calls", "points_made")
+
     def __init__(self, name: str, number: int, points: dict) -> None:
         self.name = name
         self.number = number
@@ -11,15 +14,24 @@ class Player():
         self.partner: Player = None
         self.next_player: Player = None
         self.asking = 0  # 0 -> my; 1 -> yours; 2 -> ours
-        self.cards = []  # players card
+        self.hand = 0  # players cards as bitmask, see cardmask
         self.still_prov = True
         self.prov_val = 0  # highest value said
-        self.tricks = []  # all tricks self made
-        self.sup_calls = []  # all colors called sup by self
+        self.tricks = ()  # all tricks self made, tuples are shared with clones
+        self.sup_calls = ()  # all colors called sup by self
         self.points_made = 0  # sum of points of self
 
+    def __getstate__(self) -> dict:
+        state = {name: getattr(self, name) for name in Player.__slots__}
+        state["points"] = dict(self.points)  # mappingproxy can't be pickled
+        return state
+
+    def __setstate__(self, state) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def take_trick(self, trick, last=False) -> None:
-        self.tricks.append(trick)
+        self.tricks += (tuple(trick),)
         self.points_made += sum([self.points[card[2]]
                                 for card in trick]) + (self.points["L"] if last else 0)
 
@@ -27,18 +39,31 @@ class Player():
         # points go to player calling or asking
         if col in self.sup_calls:
             return
-        self.sup_calls.append(col)
+        self.sup_calls += (col,)
         self.points_made += self.points[col]
 
+    @property
+    def cards(self) -> list:
+        """Sorted list of the players cards."""
+        return cardmask.cards_of(self.hand)
+
+    @cards.setter
+    def cards(self, cards) -> None:
+        self.hand = cardmask.mask_of(cards)
+
     def give_card(self, c: str) -> None:
         """Gives the player an additional card."""
-        self.cards.append(c)
-        # ? sorting doesn't need to be here but is convenient
-        self.cards = utils.sorted_cards(self.cards)
+        self.hand |= cardmask.CARD_BIT[c]
 
     def take_card(self, c: str) -> None:
-        self.cards = list(set(self.cards) - {c, })
-        self.cards = utils.sorted_cards(self.cards)
+        self.hand &= ~cardmask.CARD_BIT[c]
+
+    def clone(self):
+        """Copy without partner and next player, see MarjaPussi.clone."""
+        player = Player.__new__(Player)
+        for name in Player.__slots__:
+            setattr(player, name, getattr(self, name))
+        return player
 
     def set_partner(self, partner) -> None:
         self.partner: Player = partner
@@ -0,0 +1,72 @@
+"""
+Compact binary records of games.
+
+A record is the deal followed by one byte per action id:
+    byte 0      DEAL (SEED in older records)
+    DEAL        9 bytes, 2 bits per card number with the player who was dealt it
+    SEED        8 bytes, little endian seed of MarjaPussi(seed=...)
+    rest        action ids (see actions), in order
+encode always writes the deal, so records don't depend on how random
+shuffles. SEED records are still read.
+Player names and rules are not part of a record, replay with the same rules.
+Files of records are append-only, every record is prefixed by its length (2 bytes).
+"""
+import struct
+
+import marjapussi.cardmask as cardmask
+
+DEAL = 0
+SEED = 1
+LENGTH = struct.Struct("<H")
+
+
+def encode(game) -> bytes:
+    """Record of all actions of game so far."""
+    if game.action_space.num_actions > 256:
+        raise ValueError("Action ids of these rules don't fit in a byte.")
+    owner = [0] * len(cardmask.CARDS)
+    for player, hand in enumerate(game.original_hands):
+        for card in cardmask.ids_of(hand):
+            owner[card] = player
+    head = bytes([DEAL]) + bytes(owner[i] | owner[i+1] << 2 | owner[i+2] << 4 | owner[i+3] << 6
+                                 for i in range(0, len(owner), 4))
+    return head + bytes(game.action_space.ids[action] for action in game.all_actions)
+
+
+def decode(record) -> tuple:
+    """(deal, seed, action ids) of record, deal is a list of 4 card lists or None if dealt by seed."""
+    if record[0] == SEED:
+        return None, int.from_bytes(record[1:9], "little"), record[9:]
+    if record[0] != DEAL:
+        raise ValueError(f"Unknown record type {record[0]}.")
+    hands = [0] * 4
+    for i, byte in enumerate(record[1:10]):
+        for j in range(4):
+            hands[byte >> 2*j & 3] |= 1 << (4*i + j)
+    return [cardmask.cards_of(hand) for hand in hands], None, record[10:]
+
+
+class RecordWriter():
+    """Appends records to a binary file."""
+
+    def __init__(self, file) -> None:
+        self.file = file
+
+    def write(self, record) -> None:
+        self.file.write(LENGTH.pack(len(record)))
+        self.file.write(record)
+
+    def write_game(self, game) -> None:
+        self.write(encode(game))
+
+
+def read_records(file):
+    """Generator over all records in a binary file written by RecordWriter."""
+    while header := file.read(LENGTH.size):
+        if len(header) < LENGTH.size:
+            raise ValueError("Truncated record file.")
+        size, = LENGTH.unpack(header)
+        record = file.read(size)
+        if len(record) < size:
+            raise ValueError("Truncated record file.")
+        yield record
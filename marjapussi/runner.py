@@ -0,0 +1,96 @@
+"""
+Play many games with one policy, in a process pool if wanted.
+
+Every game gets its own seed derived from the seed of the run, so deals are
+reproducible and independent of how games are split across workers.
+"""
+import os
+import random
+from queue import SimpleQueue
+from random import Random
+from multiprocessing import Pool
+
+from marjapussi.game import MarjaPussi
+
+PLAYER_NAMES = ["P1", "P2", "P3", "P4"]
+
+
+def game_seed(seed, number) -> int:
+    """Seed of game number in a run with seed."""
+    return Random(f"{seed}/{number}").getrandbits(64)
+
+
+def play_game(policy, seed=None, player_names=PLAYER_NAMES, override_rules={}, deal=None) -> dict:
+    """
+    Plays a single game dealt with seed, or with the cards of deal (4 lists of cards), returns
+    its end_info() with the seed added (None with deal). policy acts for every seat, or is
+    a list of one policy per seat. Only the deal follows from seed, policies that should be
+    reproducible need their own random.Random, e.g. seeded with game.seed.
+    """
+    seat_policies = [policy] * 4 if callable(policy) else policy
+    game = MarjaPussi(player_names, override_rules=override_rules, log=False,
+                      seed=seed if deal is None else None, deal=deal)
+    while game.phase != "DONE":
+        action = seat_policies[game.player_at_turn.number](game)
+        if not game.act_action(action):
+            raise ValueError(f"Policy chose illegal action {action}.")
+    info = game.end_info()
+    info["seed"] = game.seed
+    return info
+
+
+# set once per worker process, see _init_worker
+_worker = {}
+
+
+def _init_worker(state) -> None:
+    """Initializer of pool processes, state is a dict of what every task needs, e.g. the policy."""
+    _worker.update(state)
+
+
+def _play_chunk(numbers) -> list:
+    return [play_game(_worker["policy"], game_seed(_worker["seed"], number),
+                      _worker["player_names"], _worker["override_rules"]) for number in numbers]
+
+
+def run_games(n, policy, workers=None, seed=None, chunksize=32, player_names=PLAYER_NAMES,
+              override_rules={}, max_pending=None):
+    """
+    Generator over the end_info() of n games played by policy, in order of completion.
+    workers=None uses all cores, workers=0 plays in this process. The policy is sent to
+    each worker once and has to be picklable. At most max_pending chunks (default two
+    per worker) are played or wait to be consumed at a time, so a slow consumer doesn't
+    pile up finished games.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    chunks = (range(start, min(start + chunksize, n)) for start in range(0, n, chunksize))
+    state = {"policy": policy, "seed": seed, "player_names": player_names, "override_rules": override_rules}
+    if workers == 0:
+        _init_worker(state)
+        for chunk in chunks:
+            yield from _play_chunk(chunk)
+        return
+    max_pending = max_pending or 2 * (workers or os.cpu_count() or 1)
+    with Pool(workers, initializer=_init_worker, initargs=(state,)) as pool:
+        yield from _unordered(pool, _play_chunk, chunks, max_pending)
+
+
+def _unordered(pool, func, tasks, max_pending):
+    """Like pool.imap_unordered with the results of func yielded one by one, max_pending tasks at a time."""
+    done = SimpleQueue()  # results and exceptions of finished tasks
+    pending = 0
+    for task in tasks:
+        if pending == max_pending:
+            yield from _result(done.get())
+            pending -= 1
+        pool.apply_async(func, (task,), callback=done.put, error_callback=done.put)
+        pending += 1
+    for _ in range(pending):
+        yield from _result(done.get())
+
+
+def _result(result) -> list:
+    if isinstance(result, BaseException):
+        raise result
+    return result
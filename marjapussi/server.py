@@ -0,0 +1,261 @@
+"""
+Asyncio session manager for many tables of MarjaPussi in one process.
+
+Actions of a table are handled one after another in order of arrival and the
+resulting state changes are pushed to the subscribers of every seat as
+diffs of seat_view. A seat that doesn't act within turn_timeout gets an
+action chosen by timeout_policy. Finished and idle tables are evicted to a
+snapshot store and restored on their next use.
+"""
+import asyncio
+import logging
+
+import marjapussi.cardmask as cardmask
+import marjapussi.record as record
+from marjapussi.game import MarjaPussi
+
+LOGGER = logging.getLogger(__name__)
+
+
+def seat_view(game, seat: int) -> dict:
+    """Everything seat may know about game, no cards of other players."""
+    playing = game.playing_player
+    return {
+        "phase": game.phase,
+        "player_at_turn": game.player_at_turn.number,
+        "hand": game.players[seat].cards,
+        "hand_sizes": [cardmask.count(p.hand) for p in game.players],
+        "game_value": game.game_value,
+        "playing_player": None if playing is None else playing.number,
+        "sup_color": game.sup_col,
+        "all_sup": game.all_sup[:],
+        "trick_num": len(game.tricks),
+        "current_trick": game.tricks[-1][:],
+        "last_action": game.all_actions[-1] if game.all_actions else None,
+        "points": [p.points_made for p in game.players],
+        "legal_actions": game.legal_actions() if game.player_at_turn.number == seat and game.phase != "DONE" else [],
+    }
+
+
+def first_legal(game) -> str:
+    return game.legal_actions()[0]
+
+
+class MemoryStore():
+    """Snapshot store keeping snapshots in a dict, a real store implements the same coroutines."""
+
+    def __init__(self) -> None:
+        self.snapshots = {}
+
+    async def save(self, table_id, snapshot) -> None:
+        self.snapshots[table_id] = snapshot
+
+    async def load(self, table_id):
+        """Snapshot of table_id, None if there is none."""
+        return self.snapshots.get(table_id)
+
+    async def delete(self, table_id) -> None:
+        self.snapshots.pop(table_id, None)
+
+
+class Table():
+    """A game in memory with its subscribers."""
+
+    __slots__ = ("game", "lock", "subscribers", "views", "last_active", "timer")
+
+    def __init__(self, game, now) -> None:
+        self.game = game
+        self.lock = asyncio.Lock()
+        self.subscribers = {}  # seat -> list of coroutine functions called with every message
+        self.views = {}  # seat -> last seat_view sent
+        self.last_active = now
+        self.timer = None
+
+    def snapshot(self) -> dict:
+        return {"player_names": [p.name for p in self.game.players], "rules": MarjaPussi.rules_dict(self.game.rules),
+                "record": record.encode(self.game)}
+
+
+class SessionManager():
+    """
+    Hosts tables by id. Subscribers are coroutine functions receiving messages
+    {"table": id, "seat": seat, "diff": {...}} with the changed entries of seat_view,
+    the first message of a subscription contains the full view.
+    """
+
+    def __init__(self, store=None, turn_timeout=None, idle_timeout=None, timeout_policy=first_legal) -> None:
+        self.store = MemoryStore() if store is None else store
+        self.turn_timeout = turn_timeout
+        self.idle_timeout = idle_timeout
+        self.timeout_policy = timeout_policy
+        self.tables = {}
+        self.timeouts = set()  # running _timeout tasks, referenced until done
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def open_table(self, table_id, player_names, override_rules={}, seed=None) -> Table:
+        if table_id in self.tables or await self.store.load(table_id) is not None:
+            raise ValueError(f"Table {table_id} exists already.")
+        game = MarjaPussi(player_names, override_rules=override_rules, log=False, seed=seed)
+        table = self.tables[table_id] = Table(game, self._now())
+        self._start_timer(table_id, table)
+        return table
+
+    async def table(self, table_id) -> Table:
+        """Table in memory, restored from the store if it was evicted."""
+        table = self.tables.get(table_id)
+        if table is None:
+            snapshot = await self.store.load(table_id)
+            if snapshot is None:
+                raise KeyError(f"No table {table_id}.")
+            # another coroutine may have restored it while loading
+            table = self.tables.get(table_id)
+            if table is None:
+                game = MarjaPussi.replay(snapshot["record"], snapshot["player_names"],
+                                         override_rules=snapshot["rules"])
+                table = self.tables[table_id] = Table(game, self._now())
+                self._start_timer(table_id, table)
+        return table
+
+    async def subscribe(self, table_id, seat: int, send) -> None:
+        """send is awaited with every message for seat, starting with the full view."""
+        while True:
+            table = await self.table(table_id)
+            async with table.lock:
+                if self.tables.get(table_id) is not table:
+                    continue  # evicted while waiting
+                table.subscribers.setdefault(seat, []).append(send)
+                view = table.views[seat] = seat_view(table.game, seat)
+                await send({"table": table_id, "seat": seat, "diff": view})
+                return
+
+    async def unsubscribe(self, table_id, seat: int, send) -> None:
+        table = self.tables.get(table_id)
+        if table is not None and send in table.subscribers.get(seat, []):
+            table.subscribers[seat].remove(send)
+
+    async def act(self, table_id, seat: int, action: str) -> bool:
+        """Acts action (an action string of MarjaPussi) for seat, False if it isn't legal."""
+        while True:
+            table = await self.table(table_id)
+            async with table.lock:
+                if self.tables.get(table_id) is not table:
+                    continue  # evicted while waiting
+                if action.split(",")[0] != str(seat) or not table.game.is_legal(action):
+                    return False
+                table.game.act_action(action)
+                await self._changed(table_id, table)
+                return True
+
+    async def _changed(self, table_id, table) -> None:
+        table.last_active = self._now()
+        self._start_timer(table_id, table)
+        for seat, subscribers in table.subscribers.items():
+            view = seat_view(table.game, seat)
+            old = table.views.get(seat, {})
+            diff = {key: value for key, value in view.items() if old.get(key) != value}
+            table.views[seat] = view
+            if diff:
+                for send in subscribers:
+                    await send({"table": table_id, "seat": seat, "diff": diff})
+
+    def _start_timer(self, table_id, table) -> None:
+        if table.timer is not None:
+            table.timer.cancel()
+            table.timer = None
+        if self.turn_timeout is not None and table.game.phase != "DONE":
+            moves = len(table.game.all_actions)
+            table.timer = asyncio.get_running_loop().call_later(
+                self.turn_timeout, self._start_timeout, table_id, moves)
+
+    def _start_timeout(self, table_id, moves) -> None:
+        task = asyncio.get_running_loop().create_task(self._timeout(table_id, moves))
+        self.timeouts.add(task)
+        task.add_done_callback(self._timeout_done)
+
+    def _timeout_done(self, task) -> None:
+        self.timeouts.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            LOGGER.error("Acting for a timed out seat failed.", exc_info=task.exception())
+
+    async def _timeout(self, table_id, moves) -> None:
+        table = self.tables.get(table_id)
+        if table is None:
+            return
+        async with table.lock:
+            # someone acted in time
+            if self.tables.get(table_id) is not table or len(table.game.all_actions) != moves:
+                return
+            game = table.game
+            try:
+                action = self.timeout_policy(game)
+            except Exception:
+                LOGGER.exception("timeout_policy failed at table %s, acting the first legal action.", table_id)
+                action = None
+            if not game.is_legal(action):
+                if action is not None:
+                    LOGGER.warning("timeout_policy chose illegal action %s at table %s, acting the first "
+                                   "legal action.", action, table_id)
+                action = first_legal(game)
+            game.act_action(action)
+            await self._changed(table_id, table)
+
+    async def evict(self, table_id) -> None:
+        """Saves table_id to the store and removes it from memory, subscribers get {"evicted": True}."""
+        table = self.tables.get(table_id)
+        if table is None:
+            return
+        async with table.lock:
+            if self.tables.get(table_id) is not table:
+                return
+            if table.timer is not None:
+                table.timer.cancel()
+            await self.store.save(table_id, table.snapshot())
+            del self.tables[table_id]
+            for seat, subscribers in table.subscribers.items():
+                for send in subscribers:
+                    await send({"table": table_id, "seat": seat, "evicted": True})
+
+    async def sweep(self) -> None:
+        """Evicts all finished tables and all tables idle for longer than idle_timeout."""
+        now = self._now()
+        for table_id, table in list(self.tables.items()):
+            idle = self.idle_timeout is not None and now - table.last_active > self.idle_timeout
+            if table.game.phase == "DONE" or idle:
+                await self.evict(table_id)
+
+    async def run_sweeper(self, interval=1.0) -> None:
+        """Sweeps every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            await self.sweep()
+
+    async def close(self) -> None:
+        """Evicts all tables."""
+        for table_id in list(self.tables):
+            await self.evict(table_id)
+
+
+class LocalConnection():
+    """In-process transport of one seat, e.g. for tests: messages are collected in a queue."""
+
+    def __init__(self, manager, table_id, seat: int) -> None:
+        self.manager = manager
+        self.table_id = table_id
+        self.seat = seat
+        self.messages = asyncio.Queue()
+        self.view = {}  # seat_view assembled from all diffs
+
+    async def connect(self) -> None:
+        await self.manager.subscribe(self.table_id, self.seat, self.send)
+
+    async def send(self, message) -> None:
+        self.view.update(message.get("diff", {}))
+        await self.messages.put(message)
+
+    async def receive(self) -> dict:
+        return await self.messages.get()
+
+    async def act(self, action: str) -> bool:
+        return await self.manager.act(self.table_id, self.seat, action)
@@ -0,0 +1,217 @@
+"""
+Double dummy solver for the trick phase.
+
+All hands are known. The party of the player at turn maximizes the points it
+has at the end of the game, the other party minimizes them. Questions and
+answers are part of the search, a trump call changes the superior color and
+scores rules["points"][col] exactly like in MarjaPussi.
+"""
+import marjapussi.cardmask as cardmask
+from marjapussi.cardmask import COLORS
+from marjapussi.zobrist import shared_cache
+
+COLOR_BIT = {col: 1 << i for i, col in enumerate(COLORS)}
+INF = float("inf")
+
+
+class Solver():
+    """Alpha-beta search with a transposition table over the states at the start of tricks."""
+
+    def __init__(self, game, max_table_size=2_000_000) -> None:
+        if game.phase not in ("QUES", "ANSW", "TRCK"):
+            raise ValueError(f"Can only solve the trick phase, game is in phase {game.phase}.")
+        self.game = game
+        points = game.rules["points"]
+        self.card_points = [points[val] for val in cardmask.VALUE_OF]
+        self.sup_points = {col: points[col] for col in COLORS}
+        self.last_points = points["L"]
+        self.team = game.player_at_turn.number % 2
+        self.max_table_size = max_table_size
+        self.table = {}  # state at start of trick -> (lower bound, upper bound)
+        self.nodes = 0
+
+    def solve(self) -> dict:
+        """Final points of the party at turn for every legal action, with optimal play afterwards."""
+        result = {}
+        for action_id in self.game.legal_action_ids():
+            game = self.game.clone()
+            game.act_action_id(action_id)
+            result[self.game.action_str(action_id)] = self.value(game)
+        return result
+
+    def best_action(self) -> str:
+        results = self.solve()
+        return max(results, key=results.get)
+
+    def value(self, game=None) -> int:
+        """Final points of the party at turn in self.game, if everyone plays perfectly from game on."""
+        game = self.game if game is None else game
+        made = sum(p.points_made for p in game.players if p.number % 2 == self.team)
+        if game.phase == "DONE":
+            return made
+        if game.phase == "ANSW":
+            # answers are few and only happen at the root, let the engine handle them
+            values = []
+            for action_id in game.legal_action_ids():
+                answered = game.clone()
+                answered.act_action_id(action_id)
+                values.append(self.value(answered))
+            return max(values) if game.player_at_turn.number % 2 == self.team else min(values)
+        self._load(game)
+        turn = game.player_at_turn.number
+        if game.phase == "QUES":
+            return made + self._lead(turn, -INF, INF)
+        return made + self._play(turn, -INF, INF)
+
+    def _load(self, game) -> None:
+        self.hands = [p.hand for p in game.players]
+        self.asking = [p.asking for p in game.players]
+        self.calls = [sum(COLOR_BIT[col] for col in p.sup_calls) for p in game.players]
+        self.sup = game.sup_col
+        self.all_sup = sum(COLOR_BIT[col] for col in set(game.all_sup))
+        self.trick = game.trick_ids[:]
+        self.leader = (game.player_at_turn.number - len(self.trick)) % 4
+        self.first = len(game.tricks) == 1
+
+    def _lead(self, turn, alpha, beta) -> int:
+        """Start of a trick, turn may ask before playing."""
+        hands, asking, calls = self.hands, self.asking, self.calls
+        key = (hands[0], hands[1], hands[2], hands[3], turn, self.sup, self.all_sup,
+               asking[0], asking[1], asking[2], asking[3], calls[0], calls[1], calls[2], calls[3])
+        low, high = self.table.get(key, (-INF, INF))
+        if low >= beta or low == high:
+            return low
+        if high <= alpha:
+            return high
+        alpha, beta = max(alpha, low), min(beta, high)
+        window = alpha, beta
+
+        maximize = turn % 2 == self.team
+        best = self._play(turn, alpha, beta)
+        for caller, col, level in self._calls(turn):
+            if maximize and best >= beta or not maximize and best <= alpha:
+                break
+            if maximize:
+                alpha = max(alpha, best)
+            else:
+                beta = min(beta, best)
+            # make call
+            sup, all_sup, old_calls, old_level = self.sup, self.all_sup, calls[caller], asking[turn]
+            gain = 0 if calls[caller] & COLOR_BIT[col] else self.sup_points[col]
+            gain = gain if caller % 2 == self.team else 0
+            self.sup, self.all_sup = col, all_sup | COLOR_BIT[col]
+            calls[caller] |= COLOR_BIT[col]
+            asking[turn] = level
+            value = gain + self._play(turn, alpha - gain, beta - gain)
+            self.sup, self.all_sup, calls[caller], asking[turn] = sup, all_sup, old_calls, old_level
+            best = max(best, value) if maximize else min(best, value)
+
+        if len(self.table) >= self.max_table_size:
+            self.table.clear()
+        if best <= window[0]:
+            self.table[key] = (low, best)
+        elif best >= window[1]:
+            self.table[key] = (best, high)
+        else:
+            self.table[key] = (best, best)
+        return best
+
+    def _calls(self, turn) -> list:
+        """
+        (caller, color, asking level after) of every question that changes the game.
+        Questions without effect only raise the asking level and never help the asker.
+        """
+        partner = (turn + 2) % 4
+        hand, partner_hand, level = self.hands[turn], self.hands[partner], self.asking[turn]
+        result = []
+        for col in COLORS:
+            free = not self.all_sup & COLOR_BIT[col]
+            if level == 0 and free and cardmask.has_pair(hand, col):
+                result.append((turn, col, level))
+            if level <= 1 and free and cardmask.has_pair(partner_hand, col):
+                result.append((partner, col, 1))
+            if cardmask.has_half(partner_hand, col) and cardmask.has_half(hand, col) and \
+                    (col != self.sup or not self.calls[partner] & COLOR_BIT[col]):
+                result.append((partner, col, 2))
+        return result
+
+    def _play(self, turn, alpha, beta) -> int:
+        """Turn has to play a card."""
+        self.nodes += 1
+        hand, trick = self.hands[turn], self.trick
+        allowed = cardmask.allowed_mask(trick, hand, sup_col=self.sup, first=self.first)
+        maximize = turn % 2 == self.team
+        best = -INF if maximize else INF
+        for card in self._moves(allowed, turn):
+            self.hands[turn] = hand ^ (1 << card)
+            trick.append(card)
+            if len(trick) == 4:
+                value = self._finish_trick(alpha, beta)
+            else:
+                value = self._play((turn + 1) % 4, alpha, beta)
+            trick.pop()
+            self.hands[turn] = hand
+            if maximize:
+                best = max(best, value)
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                beta = min(beta, best)
+            if alpha >= beta:
+                break
+        return best
+
+    def _finish_trick(self, alpha, beta) -> int:
+        trick = self.trick
+        _, win = cardmask.trick_winner(trick, sup_col=self.sup)
+        winner = (self.leader + win) % 4
+        last = not any(self.hands)
+        gain = 0
+        if winner % 2 == self.team:
+            gain = sum(self.card_points[card] for card in trick) + (self.last_points if last else 0)
+        if last:
+            return gain
+        old = self.trick, self.leader, self.first
+        self.trick, self.leader, self.first = [], winner, False
+        value = gain + self._lead(winner, alpha - gain, beta - gain)
+        self.trick, self.leader, self.first = old
+        return value
+
+    def _moves(self, allowed, turn) -> list:
+        """
+        Allowed cards without equivalent ones, best guesses first. Two cards are equivalent
+        if they are worth the same and no card of another player lies between them.
+        """
+        trick = self.trick
+        live = self.hands[0] | self.hands[1] | self.hands[2] | self.hands[3] | cardmask.trick_mask(trick)
+        moves = []
+        for card in cardmask.ids_of(allowed):
+            above = live & cardmask.ABOVE[card]
+            neighbour = above.bit_length() - 1
+            if above and allowed >> neighbour & 1 and self.card_points[neighbour] == self.card_points[card]:
+                continue
+            moves.append(card)
+        if not trick or len(moves) < 2:
+            return moves
+        best, win = cardmask.trick_winner(trick, sup_col=self.sup)
+        winning = cardmask.BEATEN_BY[self.sup][best]
+        if (self.leader + win) % 2 == turn % 2:
+            # partner wins, give points
+            return sorted(moves, key=lambda card: -self.card_points[card])
+        # try to take the trick first, else throw away as little as possible
+        return sorted(moves, key=lambda card: (not winning >> card & 1, self.card_points[card]))
+
+
+def solve(game, cache=shared_cache) -> dict:
+    """
+    Final points of the party at turn for every legal action, see Solver.solve. Results are
+    kept in cache by game.state_hash (see marjapussi.zobrist), cache=None solves every time.
+    """
+    if cache is None:
+        return Solver(game).solve()
+    key = (game.state_hash, "solve")
+    result = cache.get(key)
+    if result is None:
+        result = Solver(game).solve()
+        cache.put(key, result)
+    return dict(result)
@@ -0,0 +1,165 @@
+"""
+Aggregate statistics over many finished games in constant memory.
+
+Games are read as the end_info() of each game, one JSON object per line
+(.jsonl), or from files of marjapussi.record records which are replayed.
+GameStats of parts of the games can be merged, aggregate splits the files
+into chunks and counts them in a process pool:
+
+    python -m marjapussi.stats games.jsonl [more files]
+"""
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+from marjapussi.game import MarjaPussi
+from marjapussi.record import read_records
+
+BAND = 20  # width of the game value bands
+CHUNK_SIZE = 1 << 26  # bytes of a .jsonl file counted by one task
+
+
+class GameStats():
+    """Counts of games, add end_info() dicts one at a time and merge with other GameStats."""
+
+    def __init__(self, override_rules={}) -> None:
+        self.points = MarjaPussi.shared_rules(override_rules)["points"]
+        self.games = 0
+        self.no_one_plays = 0
+        self.schwarz = 0
+        self.game_values = {}  # final game value -> games
+        self.playing_seats = [0] * 4
+        self.bands = {}  # lowest value of the band -> [played, won]
+        self.sup_calls = [0] * 4  # calls of a pair by seat
+        self.sup_games = [0] * 4  # games a seat called at least one pair
+        self.trick_points = [{} for _ in range(9)]  # points of trick i -> count
+
+    def add(self, info) -> None:
+        players = info["players"]
+        self.games += 1
+        for seat, name in enumerate(players):
+            calls = len(info["players_sup"][name])
+            self.sup_calls[seat] += calls
+            self.sup_games[seat] += calls > 0
+        for i, trick in enumerate(info["tricks"]):
+            if len(trick) == 4:
+                points = sum(self.points[card[2]] for card in trick) + (self.points["L"] if i == 8 else 0)
+                self.trick_points[i][points] = self.trick_points[i].get(points, 0) + 1
+        if info["playing_player"] is None:
+            self.no_one_plays += 1
+            return
+        value = info["game_value"]
+        self.game_values[value] = self.game_values.get(value, 0) + 1
+        seat = players.index(info["playing_player"])
+        self.playing_seats[seat] += 1
+        made = info["players_points"][players[seat]] + info["players_points"][players[(seat + 2) % 4]]
+        band = self.bands.setdefault(value // BAND * BAND, [0, 0])
+        band[0] += 1
+        band[1] += made >= value
+        self.schwarz += info["schwarz_game"]
+
+    def merge(self, other) -> "GameStats":
+        """Adds the counts of other to self, returns self."""
+        self.games += other.games
+        self.no_one_plays += other.no_one_plays
+        self.schwarz += other.schwarz
+        _add_counts(self.game_values, other.game_values)
+        for band, (played, won) in other.bands.items():
+            counts = self.bands.setdefault(band, [0, 0])
+            counts[0] += played
+            counts[1] += won
+        for seat in range(4):
+            self.playing_seats[seat] += other.playing_seats[seat]
+            self.sup_calls[seat] += other.sup_calls[seat]
+            self.sup_games[seat] += other.sup_games[seat]
+        for mine, theirs in zip(self.trick_points, other.trick_points):
+            _add_counts(mine, theirs)
+        return self
+
+    def summary(self) -> dict:
+        """Rates and distributions of all games added so far."""
+        games = max(self.games, 1)
+        played = max(self.games - self.no_one_plays, 1)
+        return {
+            "games": self.games,
+            "no_one_plays": self.no_one_plays / games,
+            "schwarz_game": self.schwarz / played,
+            "playing_seat": [count / played for count in self.playing_seats],
+            "game_value": {value: self.game_values[value] for value in sorted(self.game_values)},
+            "win_rate_by_band": {f"{band}-{band + BAND - 1}": {"games": n, "win_rate": won / n}
+                                 for band, (n, won) in sorted(self.bands.items())},
+            "sup_calls_per_game": [calls / games for calls in self.sup_calls],
+            "sup_call_rate": [count / games for count in self.sup_games],
+            "trick_points": [_distribution(counts) for counts in self.trick_points],
+        }
+
+
+def _add_counts(counts, other) -> None:
+    for key, count in other.items():
+        counts[key] = counts.get(key, 0) + count
+
+
+def _distribution(counts) -> dict:
+    n = sum(counts.values())
+    return {"mean": sum(p * c for p, c in counts.items()) / n if n else None,
+            "counts": {p: counts[p] for p in sorted(counts)}}
+
+
+def iter_infos(path, start=0, end=None, override_rules={}):
+    """
+    end_info() dicts of the games in a .jsonl file, only of the lines starting at byte
+    start up to end, or of all games in a record file.
+    """
+    if not path.endswith(".jsonl"):
+        with open(path, "rb") as f:
+            for record in read_records(f):
+                yield MarjaPussi.replay(record, override_rules=override_rules).end_info()
+        return
+    with open(path, "rb") as f:
+        if start:
+            # the line at start belongs to the chunk before if it starts earlier
+            f.seek(start - 1)
+            f.readline()
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+def chunks(paths, chunk_size=CHUNK_SIZE) -> list:
+    """(path, start, end) of parts of the files to count separately, record files are not split."""
+    result = []
+    for path in paths:
+        size = os.path.getsize(path) if path.endswith(".jsonl") else 0
+        result += [(path, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)] \
+            or [(path, 0, None)]
+    return result
+
+
+def _count_chunk(task) -> GameStats:
+    path, start, end, override_rules = task
+    stats = GameStats(override_rules)
+    for info in iter_infos(path, start, end, override_rules):
+        stats.add(info)
+    return stats
+
+
+def aggregate(paths, workers=None, chunk_size=CHUNK_SIZE, override_rules={}) -> GameStats:
+    """GameStats of all games in paths, workers=None uses all cores, workers=0 counts in this process."""
+    tasks = [(path, start, end, override_rules) for path, start, end in chunks(paths, chunk_size)]
+    stats = GameStats(override_rules)
+    if workers == 0:
+        for task in tasks:
+            stats.merge(_count_chunk(task))
+        return stats
+    with Pool(workers) as pool:
+        for partial in pool.imap_unordered(_count_chunk, tasks):
+            stats.merge(partial)
+    return stats
+
+
+if __name__ == "__main__":
+    print(json.dumps(aggregate(sys.argv[1:]).summary(), indent=2))
@@ -0,0 +1,156 @@
+"""
+Round-robin tournaments of policies with duplicate deals.
+
+Every pair of policies plays boards. A board is one deal played twice with
+the same cards on the same seats, once with the first policy on seats 0 and
+2 and once with the teams swapped, so card luck cancels out. The result of
+a board is the sum of the scores of the first policy in both games. A pair
+stops early once the confidence interval of its mean board result excludes
+0. Boards are played in a process pool:
+
+    python -m marjapussi.tournament marjapussi.bot:random_policy marjapussi.bot:greedy_policy
+"""
+import argparse
+import importlib
+import json
+import random
+from itertools import combinations
+from math import sqrt
+from multiprocessing import Pool
+from statistics import NormalDist
+
+from marjapussi.runner import _init_worker, _worker, game_seed, play_game
+
+
+def game_score(info, seat) -> int:
+    """
+    Score of the party of seat in a finished game (end_info), like MarjaPussi.eval_game: the
+    playing party wins the game value if its points reach it and loses it otherwise.
+    """
+    if info["playing_player"] is None:
+        return 0
+    names, points = info["players"], info["players_points"]
+    playing = names.index(info["playing_player"])
+    made = points[names[playing]] + points[names[(playing + 2) % 4]]
+    score = info["game_value"] if made >= info["game_value"] else -info["game_value"]
+    return score if seat % 2 == playing % 2 else -score
+
+
+def play_board(first, second, seed, override_rules={}) -> int:
+    """Score of policy first over both games of a board against policy second."""
+    info = play_game([first, second, first, second], seed, override_rules=override_rules)
+    # the same cards on the same seats, whatever the shuffle of the seed did
+    deal = [info["cards"][name] for name in info["players"]]
+    swapped = play_game([second, first, second, first], deal=deal, override_rules=override_rules)
+    return game_score(info, 0) + game_score(swapped, 1)
+
+
+class PairStats():
+    """Running mean and variance of the board results of one pair (Welford)."""
+
+    def __init__(self) -> None:
+        self.boards = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, result) -> None:
+        self.boards += 1
+        delta = result - self.mean
+        self.mean += delta / self.boards
+        self.m2 += delta * (result - self.mean)
+
+    def interval(self, confidence=0.95) -> tuple:
+        """Normal approximation of the confidence interval of the mean."""
+        if self.boards < 2:
+            return (-float("inf"), float("inf"))
+        half = NormalDist().inv_cdf((1 + confidence) / 2) * sqrt(self.m2 / (self.boards - 1) / self.boards)
+        return (self.mean - half, self.mean + half)
+
+    def separated(self, confidence=0.95) -> bool:
+        low, high = self.interval(confidence)
+        return low > 0 or high < 0
+
+
+def _play_boards(task) -> tuple:
+    pair, boards = task
+    first, second = (_worker["policies"][name] for name in pair)
+    return pair, [play_board(first, second, game_seed(_worker["seed"], board), _worker["override_rules"])
+                  for board in boards]
+
+
+def round_robin(policies, max_boards=1000, min_boards=100, batch=50, confidence=0.95, workers=None,
+                seed=None, override_rules={}) -> dict:
+    """
+    Plays every pair of policies (a dict name -> policy) for up to max_boards boards, in
+    rounds of batch boards per pair. After min_boards a pair stops as soon as the mean
+    board result is different from 0 with confidence. workers=None uses all cores,
+    workers=0 plays in this process. Policies have to be picklable.
+    """
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    stats = {pair: PairStats() for pair in combinations(policies, 2)}
+
+    def running():
+        return [pair for pair, s in stats.items() if s.boards < max_boards
+                and not (s.boards >= min_boards and s.separated(confidence))]
+
+    def rounds(play):
+        while pairs := running():
+            # every pair plays the same deals
+            tasks = [(pair, range(stats[pair].boards, min(stats[pair].boards + batch, max_boards)))
+                     for pair in pairs]
+            for pair, results in play(tasks):
+                for result in results:
+                    stats[pair].add(result)
+
+    state = {"policies": policies, "seed": seed, "override_rules": override_rules}
+    if workers == 0:
+        _init_worker(state)
+        rounds(lambda tasks: map(_play_boards, tasks))
+    else:
+        with Pool(workers, initializer=_init_worker, initargs=(state,)) as pool:
+            rounds(lambda tasks: pool.imap_unordered(_play_boards, _split(tasks)))
+    return standings(stats, confidence, seed)
+
+
+def _split(tasks) -> list:
+    """Tasks of at most 10 boards, so a round is spread over all workers."""
+    return [(pair, boards[i:i + 10]) for pair, boards in tasks for i in range(0, len(boards), 10)]
+
+
+def standings(stats, confidence, seed) -> dict:
+    """Results of all pairs and the policies by their average result per board, best first."""
+    pairs = {}
+    totals = {}
+    for (first, second), s in stats.items():
+        low, high = s.interval(confidence)
+        pairs[f"{first} vs {second}"] = {"boards": s.boards, "mean": s.mean, "interval": [low, high],
+                                         "separated": s.separated(confidence)}
+        for name, sign in ((first, 1), (second, -1)):
+            totals.setdefault(name, []).append(sign * s.mean)
+    ranking = sorted(((sum(means) / len(means), name) for name, means in totals.items()), reverse=True)
+    return {"seed": seed, "confidence": confidence, "pairs": pairs,
+            "ranking": [{"policy": name, "mean": mean} for mean, name in ranking]}
+
+
+def load_policy(path):
+    """Policy from "module:name", e.g. "marjapussi.bot:greedy_policy"."""
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("policies", nargs="+", help="module:name of every policy")
+    parser.add_argument("--boards", type=int, default=1000, help="max boards per pair")
+    parser.add_argument("--min-boards", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    policies = {path: load_policy(path) for path in args.policies}
+    print(json.dumps(round_robin(policies, max_boards=args.boards, min_boards=args.min_boards,
+                                 workers=args.workers, seed=args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
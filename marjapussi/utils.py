@@ -1,6 +1,5 @@
-COLORS = [c for c in "rseg"]
-VALUES = [v for v in "AZKOU9876"]
-CARDS = [c + "-" + v for c in COLORS for v in VALUES]
+import marjapussi.cardmask as cardmask
+from marjapussi.cardmask import COLORS, VALUES, CARDS
 
 
 COLOR_NAMES = {c: name for c, name in zip(
@@ -12,67 +11,38 @@ text_format = {"r": "\033[91m", "s": "\033[93m", "e": "\033[96m", "g": "\033[92m
 
 def allowed_first(cards) -> list:
     """First player has to play an ace, green or any card."""
-    allowed = [c for c in cards if c[2] == 'A']
-    if not allowed:
-        allowed = [c for c in cards if c[0] == 'g']
-    if not allowed:
-        allowed = cards[:]
-    return allowed
+    return allowed_general([], cards, first=True)
 
 
 def allowed_general(trick, cards, sup_col=None, first=False) -> list:
-    if len(trick) == 0 and first:
-        return allowed_first(cards)
-    if not trick:
-        return cards
-    trick_col = trick[0][0]
-    if first:
-        # check for ace
-        if (ace := f"{trick_col}-A") in cards:
-            return [ace]
-    
-    if not (allowed:=[c for c in cards if c[0] == trick_col]):
-        allowed = [c for c in cards if c[0] == sup_col]
-    if (b:=list(filter(lambda card: card == high_card(trick+[card], sup_col=sup_col), allowed))):
-        allowed = b
-    return allowed if allowed else cards
+    """String view of cardmask.allowed_mask."""
+    return cardmask.cards_of(cardmask.allowed_mask(
+        [cardmask.CARD_ID[c] for c in trick], cardmask.mask_of(cards), sup_col=sup_col, first=first))
 
 
 def high_card(cards, sup_col="") -> str:
     """Finds highest card in single trick."""
     if not cards:
         return None
-    high = cards[0]
-    col = cards[0][0]
-    #!! also not really nice, there has to be a cleaner way but
-    for c in cards:
-        if c[0] == col and higher_value(high, c):
-            high = c
-
-    sup_high = high_card([c for c in cards if c[0] == sup_col]
-                         ) if sup_col != "" and sup_col != col else None
-    return sup_high if not sup_high is None else high
+    card, _ = cardmask.trick_winner([cardmask.CARD_ID[c] for c in cards], sup_col=sup_col)
+    return CARDS[card]
 
 
 def higher_value(base, card) -> bool:
     """Returns True if card has higher value than base."""
-    for val in VALUES:
-        if base[2] == val:
-            return False
-        if card[2] == val:
-            return True
+    return cardmask.VALUE_RANK[card[2]] < cardmask.VALUE_RANK[base[2]]
 
 
 def contains_pair(cards, col) -> bool:
-    return f"{col}-K" in cards and f"{col}-O" in cards
+    return cardmask.has_pair(cardmask.mask_of(cards), col)
 
 
 def contains_half(cards, col) -> bool:
-    return f"{col}-K" in cards or f"{col}-O" in cards
+    return cardmask.has_half(cardmask.mask_of(cards), col)
 
 
 def sorted_cards(cards) -> list:
-    return [card for card in CARDS if card in set(cards)]
+    return cardmask.cards_of(cardmask.mask_of(cards))
 
 
 def card_str(card, fancy=True) -> str:
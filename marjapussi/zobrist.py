@@ -0,0 +1,122 @@
+"""
+Zobrist keys of game states and a shared cache keyed by them.
+
+MarjaPussi.state_hash is the xor of one random 64 bit key for every part of
+the state: where every card is (a hand, a place in the current trick, or
+played), cards waiting to be passed, the player at turn, phase, game value,
+players gone in PROV, the playing player, superior and former superior
+colors, asking levels, the open question, pair calls, points made and the
+rules. The game updates it with every action, full_hash computes it from
+scratch. Equal states have equal hashes, no matter how they were reached.
+"""
+from random import Random
+
+import marjapussi.cardmask as cardmask
+from marjapussi.actions import PHASES
+from marjapussi.cardmask import COLORS
+
+PLAYED = 8  # card location of played cards, 0-3 are the hands, 4-7 the places in the current trick
+
+_rng = Random(0x6D61726A61)
+CARD = [[_rng.getrandbits(64) for _ in range(PLAYED + 1)] for _ in cardmask.CARDS]
+PENDING = [_rng.getrandbits(64) for _ in cardmask.CARDS]  # passed, still in the hand until all 4 are
+TURN = [_rng.getrandbits(64) for _ in range(4)]
+PHASE = {phase: _rng.getrandbits(64) for phase in PHASES}
+GONE = [_rng.getrandbits(64) for _ in range(4)]  # not still_prov
+PLAYING = [_rng.getrandbits(64) for _ in range(4)]
+SUP = {col: _rng.getrandbits(64) for col in COLORS}
+SUP[""] = 0
+ALL_SUP = {col: _rng.getrandbits(64) for col in COLORS}
+ASKING = [[0, _rng.getrandbits(64), _rng.getrandbits(64)] for _ in range(4)]
+QUESTION = {ques: _rng.getrandbits(64) for ques in ["you"] + [f"ou{col}" for col in COLORS]}
+SUP_CALL = [{col: _rng.getrandbits(64) for col in COLORS} for _ in range(4)]
+
+
+_KEYS = {}  # keys of values, points and rules, made on first use
+
+
+def _key(name) -> int:
+    key = _KEYS.get(name)
+    if key is None:
+        key = _KEYS[name] = Random(name).getrandbits(64)
+    return key
+
+
+def value_key(value) -> int:
+    return _key(f"value/{value}")
+
+
+def points_key(player, points) -> int:
+    return _key(f"points/{player}/{points}")
+
+
+def rules_key(rules_repr) -> int:
+    return _key(f"rules/{rules_repr}")
+
+
+def full_hash(game) -> int:
+    """Zobrist hash of the state of game, computed from scratch."""
+    h = rules_key(repr(dict(game.rules)))
+    # the last trick stays in trick_ids when the game is done
+    trick = game.trick_ids if len(game.trick_ids) < 4 else []
+    for i, card in enumerate(trick):
+        h ^= CARD[card][4 + i]
+    for card in cardmask.ids_of(game.played & ~cardmask.trick_mask(trick)):
+        h ^= CARD[card][PLAYED]
+    if game.phase in ("PASS", "PBCK"):
+        for card in game.passed_cards["forth" if game.phase == "PASS" else "back"]:
+            h ^= PENDING[cardmask.CARD_ID[card]]
+    for p in game.players:
+        for card in cardmask.ids_of(p.hand):
+            h ^= CARD[card][p.number]
+        h ^= ASKING[p.number][p.asking] ^ points_key(p.number, p.points_made)
+        h ^= 0 if p.still_prov else GONE[p.number]
+        for col in p.sup_calls:
+            h ^= SUP_CALL[p.number][col]
+    for col in set(game.all_sup):
+        h ^= ALL_SUP[col]
+    if game.playing_player is not None:
+        h ^= PLAYING[game.playing_player.number]
+    if game.phase == "ANSW":
+        h ^= QUESTION[game.all_actions[-1][-3:]]
+    return h ^ TURN[game.player_at_turn.number] ^ PHASE[game.phase] ^ SUP[game.sup_col] ^ \
+        value_key(game.game_value)
+
+
+class LRUCache():
+    """Bounded mapping, the least recently used entries are dropped first."""
+
+    def __init__(self, maxsize=1 << 16) -> None:
+        self.maxsize = maxsize
+        self.data = {}  # in order of use
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        self.data.pop(key, None)
+        self.data[key] = value
+        if len(self.data) > self.maxsize:
+            del self.data[next(iter(self.data))]
+
+    def __contains__(self, key) -> bool:
+        return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def clear(self) -> None:
+        self.data.clear()
+        self.hits = self.misses = 0
+
+
+# evaluations of game states shared by all bots and tools, keys are (state_hash, name of the evaluation)
+shared_cache = LRUCache()
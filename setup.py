@@ -12,5 +12,7 @@ setuptools.setup(
     description="Python Implementation of MarjaPussi.",
     long_description=long_description,
     packages=["marjapussi"],
+    package_data={"marjapussi": ["data/*.bin"]},
     python_requires='>=3.9',
+    extras_require={"batch": ["numpy>=1.20"]},
 )